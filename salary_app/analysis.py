@@ -1,7 +1,12 @@
-from typing import Dict
+from typing import Dict, List, Mapping, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from scipy.stats import binned_statistic
+
+from constants import SALARY_COLUMN, EMPLOYMENT_COLUMN, FISCAL_HOURS, \
+    COLLEGE_NAME, CURRENCY_NORM, HISTOGRAM_BIN_SIZE, FY_LIST, INFLATION_DATA
+
+GROUP_COLUMNS = [COLLEGE_NAME, 'Department', 'College Location']
 
 '''
 DEPRECATED. SEE etl.get_unique_names for name matching
@@ -38,28 +43,629 @@ def match_by_name(data_dict: Dict[str, pd.DataFrame], fy_current: str,
 '''
 
 
-def compute_bin_averages(salary_arr: list, percent_arr: list, index, bins,
-                         pay_norm: int = 1):
+class GroupIndex:
+    """
+    Row positions of each College, Department and College Location of a
+    fiscal year, the departments of each College, and row positions in
+    order of descending salary for all of campus and each College. Built
+    once, so that selections do not scan or sort the table
+
+    :param df: DataFrame of a fiscal year
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_records = len(df)
+
+        self.positions: Dict[str, Dict[str, np.ndarray]] = {}
+        for column in GROUP_COLUMNS:
+            if column in df.columns:
+                self.positions[column] = \
+                    df.groupby(column, observed=True).indices
+
+        # College Location in order of appearance for Salary Summary page
+        self.locations = []
+        self.missing_location = False
+        if 'College Location' in df.columns:
+            self.locations = df['College Location'].dropna().unique().tolist()
+            self.missing_location = bool(df['College Location'].isnull().any())
+
+        self.college_departments: Dict[str, List[str]] = {}
+        if COLLEGE_NAME in df.columns:
+            t_df = df[[COLLEGE_NAME, 'Department']].dropna().drop_duplicates()
+            for college, dept in t_df.groupby(COLLEGE_NAME, observed=True):
+                self.college_departments[college] = sorted(dept['Department'])
+
+        # Descending salary order, without missing salaries. Negative
+        # salaries are kept for binary search in ascending order
+        salary = df[SALARY_COLUMN].to_numpy(dtype='float64')
+        self.salary_order: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            '': self._salary_order(salary, np.arange(len(salary)))
+        }
+        for college, pos in self.positions.get(COLLEGE_NAME, {}).items():
+            self.salary_order[college] = self._salary_order(salary, pos)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory usage in bytes of row positions and salaries"""
+        nbytes = sum(pos.nbytes for positions in self.positions.values()
+                     for pos in positions.values())
+        return nbytes + sum(pos.nbytes + neg_salary.nbytes for
+                            pos, neg_salary in self.salary_order.values())
+
+    @staticmethod
+    def _salary_order(salary: np.ndarray, pos: np.ndarray) -> \
+            Tuple[np.ndarray, np.ndarray]:
+        neg_salary = -salary[pos]
+        order = np.argsort(neg_salary, kind='stable')
+        order = order[~np.isnan(neg_salary[order])]
+        return pos[order], neg_salary[order]
+
+    def keys(self, column: str) -> List[str]:
+        """Sorted groups of a column"""
+        return sorted(self.positions.get(column, {}))
+
+    def take(self, column: str, keys: list) -> np.ndarray:
+        """Sorted row positions of groups of a column"""
+        positions = self.positions.get(column, {})
+        pos_list = [positions[key] for key in keys if key in positions]
+        if not pos_list:
+            return np.array([], dtype=int)
+        return np.sort(np.concatenate(pos_list))
+
+    def departments(self, college_list: list) -> List[str]:
+        """Sorted departments of a list of colleges"""
+        return sorted(set().union(*[self.college_departments.get(college, [])
+                                    for college in college_list]))
+
+    def count(self, college: str = '') -> int:
+        """Number of records of a College, or all of campus"""
+        if college:
+            return len(self.positions[COLLEGE_NAME].get(college, []))
+        return self.n_records
+
+    def max_salary(self, college: str = '') -> float:
+        """Maximum salary of a College, or all of campus"""
+        neg_salary = self.salary_order[college][1]
+        return -neg_salary[0] if len(neg_salary) else np.nan
+
+    def highest(self, min_salary: float, college: str = '') -> np.ndarray:
+        """Row positions with salary at or above min_salary, highest first,
+        for a College or all of campus"""
+        pos, neg_salary = self.salary_order[college]
+        return pos[:np.searchsorted(neg_salary, -min_salary, side='right')]
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """Lowercase ASCII names with punctuation replaced by single spaces, for
+    name search. E.g., 'Doe, Jane' becomes 'doe jane'"""
+    return names.astype(str).str.normalize('NFKD'). \
+        str.encode('ascii', 'ignore').str.decode('ascii').str.lower(). \
+        str.replace(r'[^0-9a-z]+', ' ', regex=True).str.strip()
+
+
+class NameIndex:
+    """
+    Search index of names of unique_df. Normalized names and their tokens
+    are sorted once, so that prefixes are found by binary search. Tokens of
+    Department and Primary Title of the latest record of each person can
+    also be searched
+
+    :param unique_df: DataFrame with unique names
+    :param panel: Panel of all FY from build_panel, for Department and
+           Primary Title tokens. Not searched if not provided
+    """
+
+    def __init__(self, unique_df: pd.DataFrame,
+                 panel: Optional[pd.DataFrame] = None):
+        self.names = unique_df['Name'].astype(str).to_numpy()
+        norm_names = normalize_names(unique_df['Name']).reset_index(drop=True)
+
+        # Prefix of full name, e.g., 'doe j'
+        self._full = self._sorted_keys(norm_names)
+
+        # Prefix of any token of name
+        self._name_tokens = self._sorted_keys(
+            norm_names.str.split().explode())
+
+        self._field_tokens = self._sorted_keys(pd.Series([], dtype=object))
+        if panel is not None:
+            # Records of each uid are sorted by fiscal year
+            uid_arr = panel.index.get_level_values(0)
+            latest = ~uid_arr.duplicated(keep='last')
+            latest_df = panel.loc[latest, ['Department', 'Primary Title']]. \
+                astype(object).fillna('')
+            latest_text = pd.Series(
+                (latest_df['Department'] + ' ' +
+                 latest_df['Primary Title']).to_numpy(),
+                index=uid_arr[latest])
+            uid = pd.Series(unique_df['uid'].to_numpy())
+            uid = uid[uid.isin(latest_text.index)]
+            field_text = pd.Series(latest_text.loc[uid].to_numpy(),
+                                   index=uid.index)
+            self._field_tokens = self._sorted_keys(
+                normalize_names(field_text).str.split().explode())
+
+    @staticmethod
+    def _sorted_keys(keys: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        keys = keys.dropna()
+        keys = keys[keys != '']
+        order = np.argsort(keys.to_numpy(dtype=str), kind='stable')
+        return keys.to_numpy(dtype=str)[order], \
+            keys.index.to_numpy(dtype=int)[order]
+
+    def _prefix_match(self, sorted_keys: Tuple[np.ndarray, np.ndarray],
+                      prefix: str) -> np.ndarray:
+        """Boolean array of names with a key that starts with prefix"""
+        keys, positions = sorted_keys
+        lo = np.searchsorted(keys, prefix, side='left')
+        hi = np.searchsorted(keys, prefix + '~', side='left')
+        match = np.zeros(len(self.names), dtype=bool)
+        match[positions[lo:hi]] = True
+        return match
+
+    def search(self, query: str, limit: int, fields: bool = True) -> \
+            List[str]:
+        """
+        Names matching a query, best matches first. Every word of the
+        query must be the start of a word of the name, or of the
+        Department or Primary Title if fields is True. Names that start
+        with the query rank first, and matches of name words rank above
+        matches of Department or Primary Title words
+
+        :param query: Search text, e.g., 'Doe, J' or 'doe physics'
+        :param limit: Maximum number of names
+        :param fields: Search Department and Primary Title
+        """
+
+        query = normalize_names(pd.Series([query]))[0]
+        if not query:
+            return []
+
+        match = np.ones(len(self.names), dtype=bool)
+        score = np.zeros(len(self.names), dtype=int)
+        for token in query.split():
+            name_match = self._prefix_match(self._name_tokens, token)
+            token_match = name_match
+            if fields:
+                field_match = self._prefix_match(self._field_tokens, token)
+                token_match = name_match | field_match
+                score += field_match
+            match &= token_match
+            score += 2 * name_match
+
+        full_match = self._prefix_match(self._full, query)
+        match |= full_match
+        score += 4 * len(query.split()) * full_match
+
+        positions = np.flatnonzero(match)
+        order = np.lexsort((self.names[positions], -score[positions]))
+        return self.names[positions[order[:limit]]].tolist()
+
+
+def salary_bins(bin_size: float, pay_norm: int, min_val: float = 10000,
+                max_val: float = 2.5e6) -> np.ndarray:
+    """
+    Salary bin edges. Edges for multiples of the finest bin size
+    (HISTOGRAM_BIN_SIZE) are taken from the finest edges, so that
+    histograms can be computed from a HistogramPyramid
+
+    :param bin_size: Bin size
+    :param pay_norm: Normalization to hours
+    :param min_val: Minimum bin value
+    :param max_val: Maximum bin value
+
+    :return: Bin edges
+    """
+
+    fine_size = HISTOGRAM_BIN_SIZE['Annual' if pay_norm == 1 else 'Hourly']
+    step = bin_size / fine_size
+    if step == int(step):
+        bins = np.arange(min_val/pay_norm, max_val/pay_norm, fine_size)
+        bins = bins[::int(step)]
+    else:
+        bins = np.arange(min_val/pay_norm, max_val/pay_norm, bin_size)
+    if CURRENCY_NORM and pay_norm == 1:
+        bins = bins / 1e3
+    return bins
+
+
+class HistogramPyramid:
+    """
+    Cumulative number of salaries of all of campus, and of each College
+    and Department of a fiscal year, at the finest salary bin edges (see
+    salary_bins). Histograms for any multiple of the finest bin size are
+    differences of cumulative numbers, without the records
+
+    :param df: DataFrame of a fiscal year
+    :param pay_norm: Normalization to hours
+    :param group_index: Group index of df. Built if not provided
+    """
+
+    def __init__(self, df: pd.DataFrame, pay_norm: int,
+                 group_index: Optional[GroupIndex] = None):
+        self.pay_norm = pay_norm
+        self.bin_size = \
+            HISTOGRAM_BIN_SIZE['Annual' if pay_norm == 1 else 'Hourly']
+        self.edges = salary_bins(self.bin_size, pay_norm)
+
+        salary = df[SALARY_COLUMN] / pay_norm
+        if CURRENCY_NORM and pay_norm == 1:
+            salary = salary / 1e3
+        salary = salary.to_numpy(dtype='float64')
+
+        if group_index is None:
+            group_index = GroupIndex(df)
+
+        # Cumulative numbers and maximum of each group
+        self.cumulative: Dict[str, Dict[str, Tuple[np.ndarray, float]]] = {
+            '': {'': self._cumulative(salary)}
+        }
+        for column in [COLLEGE_NAME, 'Department']:
+            self.cumulative[column] = {
+                key: self._cumulative(salary[pos]) for key, pos in
+                group_index.positions.get(column, {}).items()
+            }
+
+    @property
+    def nbytes(self) -> int:
+        """Memory usage in bytes of bin edges and cumulative numbers"""
+        return self.edges.nbytes + sum(
+            cumulative.nbytes for groups in self.cumulative.values()
+            for cumulative, _ in groups.values())
+
+    def _cumulative(self, salary: np.ndarray) -> Tuple[np.ndarray, float]:
+        # Number below (first row) and at or below (second row) each edge.
+        # Numbers are constant after the maximum, so they are not kept
+        salary = np.sort(salary[~np.isnan(salary)])
+        below = np.searchsorted(salary, self.edges, side='left')
+        n_edges = min(np.searchsorted(below, len(salary)) + 1, len(below))
+        cumulative = np.stack([
+            below[:n_edges],
+            np.searchsorted(salary, self.edges[:n_edges], side='right'),
+        ]).astype('int32')
+        max_salary = salary[-1] if len(salary) else np.nan
+        return cumulative, max_salary
+
+    def histogram(self, bin_size: float, column: str = '',
+                  keys: Optional[list] = None) -> \
+            Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Histogram of salary, as numpy.histogram with salary_bins
+
+        :param bin_size: Bin size. Must be a multiple of the finest bin size
+        :param column: COLLEGE_NAME or 'Department'. All of campus if empty
+        :param keys: Groups of column to include
+
+        :return: Number in each bin, bin edges, and maximum salary
+        """
+
+        step = bin_size / self.bin_size
+        if step != int(step) or step < 1:
+            raise ValueError(f"Bin size must be a multiple of {self.bin_size}: "
+                             f"{bin_size}")
+        index = np.arange(0, len(self.edges), int(step))
+
+        groups = self.cumulative[column]
+        if not column:
+            keys = ['']
+
+        cumulative = np.zeros(len(index), dtype='int64')
+        max_salary = np.nan
+        for key in keys:
+            t_cumulative, t_max = groups[key]
+            t_index = np.minimum(index, t_cumulative.shape[1] - 1)
+            # Last bin includes the right edge, as numpy.histogram
+            cumulative[:-1] += t_cumulative[0, t_index[:-1]]
+            cumulative[-1] += t_cumulative[1, t_index[-1]]
+            max_salary = np.fmax(max_salary, t_max)
+
+        return np.diff(cumulative), self.edges[index], max_salary
+
+
+# Columns of fiscal years in panel, for Wage Growth and Individual Search
+PANEL_COLUMNS = ['Name', SALARY_COLUMN, EMPLOYMENT_COLUMN, 'FTE',
+                 'Primary Title', 'Department', COLLEGE_NAME,
+                 'State Fund Ratio']
+
+
+def build_panel(data_dict: Mapping[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Stack records with uid of all fiscal years into a panel, indexed and
+    sorted by uid and fiscal year. Only PANEL_COLUMNS are included, with
+    names as categories since they repeat across years. Records of a uid
+    that appear more than once in a fiscal year are not unique to a person
+    and are excluded. Each record includes the change from the person's
+    previous record:
+
+      - 'prev_fiscal_year': Fiscal year of previous record
+      - '%': Percentage change in salary
+      - 'Title Changed': True if Primary Title is different
+
+    :param data_dict: Mapping of fiscal year to DataFrame, latest first
 
-    mean_stat, bin_edges, binnumber = \
-        binned_statistic(salary_arr[index], percent_arr[index],
-                         statistic='mean', bins=bins,
-                         range=[10, 2400])
+    :return: Panel DataFrame
+    """
+
+    df_list = []
+    for fy in list(data_dict)[::-1]:
+        df = data_dict[fy]
+        columns = ['uid'] + [c for c in PANEL_COLUMNS if c in df.columns]
+        df_list.append(df.loc[df['uid'].notnull(), columns].
+                       assign(fiscal_year=fy))
+
+    panel = pd.concat(df_list, ignore_index=True)
+    panel['uid'] = panel['uid'].astype('int64')
+    panel['Name'] = panel['Name'].astype('category')
+    panel = panel.loc[~panel.duplicated(['uid', 'fiscal_year'], keep=False)]
+    panel = panel.sort_values(['uid', 'fiscal_year'])
+
+    same_uid = panel['uid'] == panel['uid'].shift()
+    panel['prev_fiscal_year'] = panel['fiscal_year'].shift(). \
+        where(same_uid).astype('category')
+    panel['%'] = (panel[SALARY_COLUMN] /
+                  panel[SALARY_COLUMN].shift().where(same_uid) - 1) * 100
+    # Categories may differ across years without a shared category dictionary
+    title = panel['Primary Title'].astype(object)
+    panel['Title Changed'] = same_uid & (title != title.shift())
+
+    return panel.set_index(['uid', 'fiscal_year'])
+
+
+def build_cpi_index() -> pd.Series:
+    """
+    Cumulative CPI index of each fiscal year from INFLATION_DATA, relative
+    to the earliest fiscal year. CPI inflation between any two fiscal years
+    is the ratio of their indices
+
+    :return: Series indexed by fiscal year, earliest first
+    """
+
+    fy_list = [fy.split(' ')[0] for fy in FY_LIST[::-1]]
+    growth = [1] + [1 + INFLATION_DATA[fy] / 100 for fy in fy_list[1:]]
+
+    return pd.Series(np.cumprod(growth), index=fy_list)
+
+
+CPI_INDEX = build_cpi_index()
+
+# Fields shown above an individual's table when the same for all records
+COMMON_FIELDS = ['Primary Title', 'Department', COLLEGE_NAME]
+
+
+def individual_growth(panel: pd.DataFrame, uids: list) -> \
+        Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Select records of individuals from panel with a single selection, and
+    compute growth metrics of all of them together
+
+    :param panel: Panel of all FY from build_panel
+    :param uids: uid of individuals. uid without records are excluded
+
+    :return: records_df: Records of panel with 'CPI %', the CPI inflation
+             since the previous record.
+             growth_df: DataFrame indexed by uid with:
+
+               - 'N': Number of records
+               - 'avg_y2y': Average year-to-year growth in salary (%)
+               - 'avg_inflation': Average year-to-year CPI inflation (%)
+               - COMMON_FIELDS: Value if the same for all records. NaN
+                 otherwise
+    """
+
+    uids = pd.Index(uids).intersection(panel.index.levels[0])
+    records_df = panel.loc[panel.index.get_level_values(0).isin(uids)].copy()
+
+    fiscal_year = records_df.index.get_level_values(1)
+    cpi = CPI_INDEX.reindex(fiscal_year).values
+    records_df['CPI %'] = \
+        (cpi / CPI_INDEX.reindex(records_df['prev_fiscal_year']).values - 1) * 100
+
+    # Records of each uid are sorted by fiscal year
+    grouped = records_df.groupby(level=0)
+    growth_df = pd.DataFrame({'N': grouped.size()})
+
+    year = pd.Series(fiscal_year.str[2:6].astype(float).values,
+                     index=records_df.index)
+    salary = records_df[SALARY_COLUMN]
+    n_years = year.groupby(level=0).last() - year.groupby(level=0).first()
+    first_salary = salary.groupby(level=0).first()
+    growth_df['avg_y2y'] = 100 * (salary.groupby(level=0).last() -
+                                  first_salary) / first_salary / n_years
+
+    cpi = pd.Series(cpi, index=records_df.index).groupby(level=0)
+    growth_df['avg_inflation'] = \
+        (cpi.last() / cpi.first() - 1) / n_years * 100
+
+    # Categories may differ across years without a shared category dictionary
+    common_df = records_df[COMMON_FIELDS].astype(object).groupby(level=0)
+    growth_df[COMMON_FIELDS] = \
+        common_df.first().where(common_df.nunique() == 1)
+
+    return records_df, growth_df
+
+
+def compute_trends(data_dict: Mapping[str, pd.DataFrame], pay_norm: int,
+                   income_brackets: List[float], n_below: int = 2) -> \
+        Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Compute statistics of all fiscal years for Trends page with a single
+    groupby over all records
+
+    :param data_dict: Mapping of fiscal year to DataFrame, latest first
+    :param pay_norm: Annual = 1, Otherwise, normalize by number of working
+           hours of each FY
+    :param income_brackets: Salary brackets, ascending
+    :param n_below: Number of brackets (first) to count at or below the
+           bracket. The rest are counted at or above the bracket
+
+    :return: DataFrame of statistics, and DataFrame of number of employees
+             for each bracket. Both are indexed by fiscal year, earliest
+             first
+    """
 
-    median_stat, bin_edges, binnumber = \
-        binned_statistic(salary_arr[index], percent_arr[index],
-                         statistic='median', bins=bins,
-                         range=[10, 2400])
+    fy_list = list(data_dict)[::-1]
+    fy_norm = np.array([1 if pay_norm == 1 else FISCAL_HOURS[fy]
+                        for fy in fy_list])
 
-    max_stat, bin_edges, binnumber = \
-        binned_statistic(salary_arr[index], percent_arr[index],
-                         statistic='max', bins=bins,
-                         range=[10, 2400])
+    columns = ['FTE', EMPLOYMENT_COLUMN, SALARY_COLUMN, 'State Fund Ratio']
+    df_list = [data_dict[fy][columns] for fy in fy_list]
+    df = pd.concat(df_list, ignore_index=True)
+    # Position of fiscal year in fy_list for each record
+    fy_code = np.repeat(np.arange(len(fy_list)), [len(t) for t in df_list])
 
-    count_stats, bin_edges, binnumber = \
-        binned_statistic(salary_arr[index], percent_arr[index],
-                         statistic='count', bins=bins,
-                         range=[10, 2400])
+    fte = df['FTE'].astype('float64')
+    t_df = pd.DataFrame({
+        'FTE': fte,
+        'part_time': fte < 1,
+        'budget': df[EMPLOYMENT_COLUMN],
+        'state_budget': df[EMPLOYMENT_COLUMN] * df['State Fund Ratio'],
+        'salary': df[SALARY_COLUMN] / fy_norm[fy_code],
+    })
+    group = t_df.groupby(fy_code)
+
+    stats_df = group['salary'].agg(['size', 'mean', 'median', 'min', 'max'])
+    stats_df['FTE'] = group['FTE'].sum()
+    stats_df['part_time'] = group['part_time'].sum()
+    # Budgets are truncated to whole dollars before normalization
+    stats_df['budget'] = np.trunc(group['budget'].sum()) / fy_norm
+    stats_df['state_budget'] = np.trunc(group['state_budget'].sum()) / fy_norm
+    stats_df.index = fy_list
+
+    # Number of employees at or below/above each bracket
+    bracket_list = []
+    for code, salary in group['salary']:
+        salary_arr = np.sort(salary.dropna().values)
+        n_bracket = np.concatenate([
+            np.searchsorted(salary_arr, income_brackets[:n_below], side='right'),
+            len(salary_arr) - np.searchsorted(salary_arr, income_brackets[n_below:],
+                                              side='left'),
+        ])
+        bracket_list.append(n_bracket)
+    bracket_df = pd.DataFrame(bracket_list, index=fy_list,
+                              columns=income_brackets)
+
+    return stats_df, bracket_df
+
+
+def histogram_by_category(data, bins, category=None,
+                          n_category: Optional[int] = None) -> np.ndarray:
+    """
+    Histogram of data for each category with a single bin assignment and
+    a single bincount, as numpy.histogram (last bin includes right edge)
+
+    :param data: Data to bin
+    :param bins: Bin edges, ascending
+    :param category: Category (0, 1, ...) of each value. Values with a
+           negative category are excluded. All in one category if not
+           provided
+    :param n_category: Number of categories. Default: largest category + 1
+
+    :return: Number in each bin for each category, of shape
+             (n_category, number of bins)
+    """
+
+    data = np.asarray(data, dtype='float64')
+    bins = np.asarray(bins, dtype='float64')
+    n_bins = len(bins) - 1
+
+    bin_number = np.searchsorted(bins, data, side='right') - 1
+    bin_number[data == bins[-1]] = n_bins - 1
+
+    if category is None:
+        category = np.zeros(len(data), dtype='int64')
+    category = np.asarray(category, dtype='int64')
+    if n_category is None:
+        n_category = int(category.max()) + 1 if len(category) else 1
+
+    use = (bin_number >= 0) & (bin_number < n_bins) & (category >= 0)
+    keys = category[use] * n_bins + bin_number[use]
+    return np.bincount(keys, minlength=n_category * n_bins).\
+        reshape(n_category, n_bins)
+
+
+def binned_statistics(x, values, bins, index_list: list) -> \
+        Dict[str, np.ndarray]:
+    """
+    Count, mean, median and max of values in bins of x for multiple
+    selections of the same sample, with a single bin assignment and a
+    single sort. Results are identical to scipy.stats.binned_statistic
+    for each selection
+
+    :param x: Data to bin
+    :param values: Data to compute statistics of
+    :param bins: Bin edges, ascending
+    :param index_list: Positions of each selection
+
+    :return: Dictionary of 'count', 'mean', 'median' and 'max', each of
+             shape (number of selections, number of bins). Empty bins are
+             NaN, except for 'count'
+    """
+
+    x = np.asarray(x, dtype='float64')
+    values = np.asarray(values, dtype='float64')
+    bin_edges = np.asarray(bins, dtype='float64')
+
+    # Bin 0 and len(bin_edges) are outside of bins, as numpy.digitize
+    bin_number = np.searchsorted(bin_edges, x, side='right')
+    # Values on the last edge are included in the last bin
+    decimal = int(-np.log10(np.diff(bin_edges).min())) + 6
+    on_edge = (x >= bin_edges[-1]) & \
+        (np.around(x, decimal) == np.around(bin_edges[-1], decimal))
+    bin_number[on_edge] -= 1
+
+    # Each bin of each selection is a group
+    n_group = len(bin_edges) + 1
+    index_list = [np.asarray(index, dtype='int64') for index in index_list]
+    keys = np.concatenate([bin_number[index] + i * n_group
+                           for i, index in enumerate(index_list)])
+    sample = np.concatenate([values[index] for index in index_list])
+    shape = (len(index_list), n_group)
+
+    count = np.bincount(keys, minlength=np.prod(shape))
+    total = np.bincount(keys, sample, minlength=np.prod(shape))
+    filled = count > 0
+
+    mean = np.full(count.shape, np.nan)
+    mean[filled] = total[filled] / count[filled]
+
+    # Values sorted within each group. Median is the average of the middle
+    # two values, and max is the last value
+    sorted_sample = sample[np.lexsort((sample, keys))]
+    start = np.cumsum(count) - count
+    mid = start[filled] + (count[filled] - 1) / 2
+    median = np.full(count.shape, np.nan)
+    median[filled] = (sorted_sample[np.floor(mid).astype('int64')] +
+                      sorted_sample[np.ceil(mid).astype('int64')]) / 2
+    max_stat = np.full(count.shape, np.nan)
+    max_stat[filled] = sorted_sample[start[filled] + count[filled] - 1]
+
+    return {
+        'count': count.reshape(shape)[:, 1:-1],
+        'mean': mean.reshape(shape)[:, 1:-1],
+        'median': median.reshape(shape)[:, 1:-1],
+        'max': max_stat.reshape(shape)[:, 1:-1],
+    }
+
+
+def compute_bin_averages(salary_arr: list, percent_arr: list,
+                         index_list: list, bins, pay_norm: int = 1) -> \
+        Tuple[List[pd.DataFrame], np.ndarray]:
+    """
+    Compute statistics of percentage change in bins of salary for
+    multiple selections
+
+    :param salary_arr: Salary of each record
+    :param percent_arr: Percentage change of each record
+    :param index_list: Positions of each selection
+    :param bins: Salary bin edges, ascending
+    :param pay_norm: Annual = 1, Otherwise, hourly
+
+    :return: List of DataFrame of statistics for each selection, and
+             bin edges
+    """
+
+    bin_edges = np.asarray(bins, dtype='float64')
+    stats = binned_statistics(salary_arr, percent_arr, bin_edges, index_list)
 
     if pay_norm == 1:
         salary_text = [f"${int(bin_edges[i]):,} - {int(bin_edges[i + 1]):,}k"
@@ -67,16 +673,18 @@ def compute_bin_averages(salary_arr: list, percent_arr: list, index, bins,
     else:
         salary_text = [f"${int(bin_edges[i]):,.01f} - {int(bin_edges[i + 1]):,.01f}/hr"
                        for i in range(len(bin_edges[:-1]))]
-    d = {
-        'Salary range': salary_text,
-        'bin': [(bin_edges[i] + bin_edges[i+1])/2
-                for i in range(len(bin_edges[:-1]))],
-        'N': [int(a) for a in count_stats],
-        'median %': median_stat,
-        'mean %': mean_stat,
-        'max %': max_stat,
-    }
+    bin_center = (bin_edges[:-1] + bin_edges[1:]) / 2
 
-    stats_df = pd.DataFrame(data=d)
+    stats_list = []
+    for i in range(len(index_list)):
+        d = {
+            'Salary range': salary_text,
+            'bin': bin_center,
+            'N': stats['count'][i].astype(int),
+            'median %': stats['median'][i],
+            'mean %': stats['mean'][i],
+            'max %': stats['max'][i],
+        }
+        stats_list.append(pd.DataFrame(data=d))
 
-    return stats_df, bin_edges
+    return stats_list, bin_edges
@@ -1,68 +1,136 @@
+from typing import Optional, Union
+
 import pandas as pd
 import streamlit as st
 
 from bokeh.models import Label
 
+from analysis import GroupIndex
 from constants import SALARY_COLUMN, EMPLOYMENT_COLUMN, COLLEGE_NAME
 
+# Columns of pandas describe()
+DESCRIBE_COLUMNS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
 
 def get_summary_data(df: pd.DataFrame, pd_loc_dict: dict, style: str,
-                     pay_norm: int):
-    """Gather pandas describe() dataframe and write to streamlit"""
+                     pay_norm: int, summary_df: Optional[pd.DataFrame] = None,
+                     group_index: Optional[GroupIndex] = None):
+    """
+    Gather pandas describe() dataframe and write to streamlit
+
+    :param df: DataFrame for viewing
+    :param pd_loc_dict: Dictionary of selected keys for each level:
+           'College Location' (missing location is 'N/A'), 'College List'
+           and 'Department List'
+    :param style: String describing the style. Options are summary,
+           college, department
+    :param pay_norm: Normalization constant for hourly/annual
+    :param summary_df: Precomputed statistics (see loader.read_summary).
+           Statistics are computed from df for levels with keys that are
+           not included
+    :param group_index: Group index of df, for departments of each college
+    """
 
     if style not in ['summary', 'college', 'department']:
         raise ValueError(f"Incorrect style input: {style}")
 
+    def _describe(level: str, keys: list) -> pd.DataFrame:
+        # Use precomputed statistics, if available for all keys
+        if summary_df is not None:
+            index = pd.MultiIndex.from_product([[level], keys])
+            if index.isin(summary_df.index).all():
+                t_df = summary_df.loc[index, DESCRIBE_COLUMNS].copy()
+                t_df.index = keys
+                t_df[DESCRIBE_COLUMNS[1:]] /= pay_norm
+                return t_df
+
+        if level == 'All':
+            return (df[SALARY_COLUMN] / pay_norm).describe().to_frame('All').T
+        else:
+            return describe_by_group(df, level, keys, pay_norm)
+
     # Include all campus data
-    all_sum = (df[SALARY_COLUMN] / pay_norm).describe().rename('All')
-    series_list = [all_sum]
+    describe_list = [_describe('All', ['All'])]
 
     str_pay_norm = "Hourly" if pay_norm != 1 else "Annual"
     # Append college location data
     if 'College Location' in pd_loc_dict:
         st.markdown(f'### Common Statistics ({str_pay_norm}):')
-        for key, sel in pd_loc_dict['College Location'].items():
-            t_row = (df[SALARY_COLUMN][sel] / pay_norm).describe().rename(key)
-            series_list.append(t_row)
+        describe_list.append(_describe('College Location',
+                                       pd_loc_dict['College Location']))
 
     # Append college data
     if 'College List' in pd_loc_dict:
         st.markdown(f'### College/Division Statistics ({str_pay_norm}):')
-        for key, sel in pd_loc_dict['College List'].items():
-            t_row = (df[SALARY_COLUMN][sel] / pay_norm).describe().rename(key)
-            series_list.append(t_row)
+        describe_list.append(_describe(COLLEGE_NAME,
+                                       pd_loc_dict['College List']))
     else:
         # Append department data for individual department selection
         if 'Department List' in pd_loc_dict:
             st.markdown(f'### Department Statistics ({str_pay_norm}):')
-            for key, sel in pd_loc_dict['Department List'].items():
-                t_row = (df[SALARY_COLUMN][sel] / pay_norm).describe().rename(key)
-                series_list.append(t_row)
+            describe_list.append(_describe('Department',
+                                           pd_loc_dict['Department List']))
 
     # Show pandas DataFrame of percentile data
-    show_percentile_data(series_list)
+    show_percentile_data(pd.concat(describe_list))
 
     # Show department percentile data by college selection
     if style == 'department' and 'College List' in pd_loc_dict:
-        for key in pd_loc_dict['College List']:
+        college_list = pd_loc_dict['College List']
+        if group_index is None:
+            group_index = GroupIndex(df)
+        dept_dict = {key: group_index.college_departments.get(key, [])
+                     for key in college_list}
+
+        # Statistics of all departments are computed together
+        dept_list = sorted(set().union(*dept_dict.values()))
+        dept_describe_df = _describe('Department', dept_list)
+        for key in college_list:
             st.write(f'Departments in {key}')
-            sel = df[COLLEGE_NAME] == key
+            show_percentile_data(dept_describe_df.loc[dept_dict[key]])
+
+
+def describe_by_group(df: pd.DataFrame, column: str, keys: list,
+                      pay_norm: int) -> pd.DataFrame:
+    """
+    Get pandas describe() of salary for each group of a column with a
+    single groupby
 
-            dept_list = sorted(df['Department'][sel].unique())
-            series_list = []
-            for d in dept_list:
-                d_sel = df['Department'] == d
-                t_row = (df[SALARY_COLUMN][d_sel] / pay_norm).describe().rename(d)
-                series_list.append(t_row)
+    :param df: DataFrame for viewing
+    :param column: Column to group by. Missing 'College Location' is 'N/A'
+    :param keys: Groups to include, in order
+    :param pay_norm: Normalization constant for hourly/annual
 
-            show_percentile_data(series_list)
+    :return: DataFrame indexed by keys
+    """
 
+    group = df[column]
+    if column == 'College Location':
+        group = group.astype(object).fillna('N/A')
 
-def show_percentile_data(series_list: list, no_count: bool = False,
+    # Aggregations of groupby are vectorized, unlike groupby describe()
+    grouped = (df[SALARY_COLUMN] / pay_norm).groupby(group, observed=True)
+    describe_df = grouped.agg(['count', 'mean', 'std', 'min'])
+    quantile_df = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    quantile_df.columns = ['25%', '50%', '75%']
+    describe_df = describe_df.join(quantile_df)
+    describe_df['max'] = grouped.max()
+
+    describe_df = describe_df.reindex(keys).rename_axis(None)
+    describe_df['count'] = describe_df['count'].fillna(0)
+    return describe_df
+
+
+def show_percentile_data(series_list: Union[list, pd.DataFrame],
+                         no_count: bool = False,
                          table_format: str = "${:,.2f}"):
-    """Write pandas DataFrame of percentile data"""
+    """Write pandas DataFrame of percentile data. Input is a list of
+    pandas describe() Series or a DataFrame with a row for each"""
 
-    summary_df = pd.concat(series_list, axis=1).transpose()
+    if isinstance(series_list, pd.DataFrame):
+        summary_df = series_list.copy()
+    else:
+        summary_df = pd.concat(series_list, axis=1).transpose()
     if no_count:
         summary_df.drop(columns='count', inplace=True)
     else:
@@ -9,9 +9,49 @@ EMPLOYMENT_COLUMN = 'Annual Salary at Employment FTE'
 STR_N_EMPLOYEES = 'Number of Employees'
 COLLEGE_NAME = 'College Name'
 
+# Column types for cleaned fiscal year tables (see etl.apply_schema).
+# Categories are shared across fiscal years (see etl.get_categories)
+DATA_DTYPES = {
+    'Name': 'object',
+    'Primary Title': 'category',
+    EMPLOYMENT_COLUMN: 'float64',
+    'FTE': 'float32',
+    SALARY_COLUMN: 'float64',
+    'State Fund Ratio': 'float32',
+    'Department': 'category',
+    COLLEGE_NAME: 'category',
+    'College Location': 'category',
+    'Athletics': 'category',
+    'uid': 'Int64',
+}
+
+# Column types for unique.csv
+UNIQUE_DTYPES = {
+    'Name': 'object',
+    'year': 'object',
+    'uid': 'int64',
+}
+
+# Percentiles of precomputed salary statistics (see etl.write_summary_tables)
+SUMMARY_PERCENTILES = [0.1, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.9]
+
+# Groups of precomputed salary statistics. Campus-wide statistics are 'All'
+SUMMARY_LEVELS = ['College Location', COLLEGE_NAME, 'Department']
+
 # Choose between annual/hourly conversion
 PAY_CONVERSION = ['Annual', 'Hourly']
 
+# Maximum number of employees in Wage Growth scatter plot. Employees in
+# the selected salary range are subsampled to this number
+LOD_MAX_POINTS = 2500
+
+# Maximum number of names shown for a search of Individual Search page
+NAME_SEARCH_LIMIT = 50
+
+# Finest salary bin size of histograms for annual and hourly pay. Bin
+# sizes of sidebar.select_bin_size are multiples of these
+HISTOGRAM_BIN_SIZE = {'Annual': 500, 'Hourly': 0.25}
+
 # List of fiscal years
 FY_LIST = [
     'FY2019-20', 'FY2018-19', 'FY2017-18',
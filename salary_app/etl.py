@@ -1,8 +1,16 @@
-from typing import Tuple, Union, Dict, List
+import hashlib
+import json
+import re
+from collections import defaultdict
+from time import perf_counter
+from typing import Tuple, Union, Dict, List, Optional, Iterator
 
 import pandas as pd
 from pathlib import Path
 
+from constants import DATA_DTYPES, UNIQUE_DTYPES, SALARY_COLUMN, \
+    SUMMARY_PERCENTILES, SUMMARY_LEVELS
+
 SALARY_COLUMNS = ['Annual Salary at Employment FTE',
                   'Annual Salary at Full FTE']
 FY_COLUMN = 'Fiscal Year'
@@ -10,75 +18,132 @@ SF_COLUMN = 'State Fund Ratio'
 
 UNIQUE_COLUMN = ['Name', 'year', 'uid']
 
+MANIFEST_FILE = 'manifest.json'  # Content hashes of stage inputs/outputs
+
 
-def main(filename: str):
+def main(filename: str, chunksize: Optional[int] = None,
+         force: bool = False):
     """This is for extraction of Daily Wildcat CSV
 
     :param filename: Full path for CSV file
+    :param chunksize: Number of rows to read at a time. Each chunk is
+           converted and written as it arrives, so memory is bounded by
+           chunksize. Default: read all at once
+    :param force: Run even if input and output are unchanged since last run
 
     Note need to delete top header manually first
     """
 
-    df = pd.read_csv(filename)
-
-    if FY_COLUMN in df.columns:
-        print(f"Dropping {FY_COLUMN} column")
-        df = df.drop(columns=[FY_COLUMN])
-
-    # Reformat to float for salary
-    df = salary_column_conversion(df, '[\$,]')
+    manifest_file = Path(filename).parent / MANIFEST_FILE
+    stage = f"main:{Path(filename).name}"
+    if not force and stage_is_current(manifest_file, stage, [filename]):
+        print(f"Skipping {stage}: input and output unchanged")
+        return
 
     outfile = filename.replace('.csv', '_clean.csv')
     print(f"Writing: {outfile}")
-    df.to_csv(outfile, index=False)
+    with open(outfile, 'w', newline='') as f:
+        for ii, df in enumerate(read_csv_chunks(filename, chunksize)):
+            if FY_COLUMN in df.columns:
+                if ii == 0:
+                    print(f"Dropping {FY_COLUMN} column")
+                df = df.drop(columns=[FY_COLUMN])
+
+            # Reformat to float for salary
+            df = salary_column_conversion(df, '[\$,]', verbose=ii == 0)
 
+            df.to_csv(f, header=ii == 0, index=False)
 
-def lebauer_table_split(filename: str):
+    update_manifest(manifest_file, stage, [filename], [outfile])
+
+
+def lebauer_table_split(filename: str, chunksize: Optional[int] = None,
+                        force: bool = False):
     """
     This here reads in David Le Bauer's table and generates clean tables for
-    each fiscal year
+    each fiscal year. Rows are routed to each fiscal year's table in a
+    single pass
 
     :param filename: Full path for CSV file
+    :param chunksize: Number of rows to read at a time. Each chunk is
+           converted and written as it arrives, so memory is bounded by
+           chunksize. Default: read all at once
+    :param force: Run even if input and outputs are unchanged since last run
     """
 
     p = Path(filename)
-    df = pd.read_csv(filename)
-
-    fiscal_years = sorted(df[FY_COLUMN].unique())
-
-    for fy in fiscal_years:
-        out_file = p.parent / f"FY{fy-1}-{fy-2000}_clean.csv"
 
-        df_select = df.loc[df[FY_COLUMN] == fy]
-        df_select = df_select.drop(columns=FY_COLUMN)
-        df_select.rename(columns={
-            ' Salary (Full FTE) ': 'Annual Salary at Full FTE',
-            ' Annual Salary (Actual) ': 'Annual Salary at Employment FTE'
-        }, inplace=True)
+    manifest_file = p.parent / MANIFEST_FILE
+    stage = f"lebauer_table_split:{p.name}"
+    if not force and stage_is_current(manifest_file, stage, [p]):
+        print(f"Skipping {stage}: input and outputs unchanged")
+        return
+
+    out_files = {}  # Open file for each fiscal year
+    try:
+        for ii, df in enumerate(read_csv_chunks(filename, chunksize)):
+            df = df.rename(columns={
+                ' Salary (Full FTE) ': 'Annual Salary at Full FTE',
+                ' Annual Salary (Actual) ': 'Annual Salary at Employment FTE'
+            })
+
+            # Reformat to float for salary
+            df = salary_column_conversion(df, '[\$, "]', verbose=ii == 0)
+
+            # Reformat to float for state fund
+            df = state_fund_column_conversion(df, verbose=ii == 0)
+
+            for fy, df_select in df.groupby(FY_COLUMN, sort=False):
+                header = fy not in out_files
+                if header:
+                    out_file = p.parent / f"FY{fy-1}-{fy-2000}_clean.csv"
+                    print(f"Writing: {out_file}")
+                    out_files[fy] = open(out_file, 'w', newline='')
+
+                df_select = df_select.drop(columns=FY_COLUMN)
+                df_select.to_csv(out_files[fy], header=header, index=False)
+    finally:
+        for f in out_files.values():
+            f.close()
+
+    update_manifest(manifest_file, stage, [p],
+                    [f.name for f in out_files.values()])
+
+
+def read_csv_chunks(filename: str, chunksize: Optional[int] = None) -> \
+        Iterator[pd.DataFrame]:
+    """
+    Read CSV in chunks of rows
 
-        # Reformat to float for salary
-        df_select = salary_column_conversion(df_select, '[\$, "]')
+    :param filename: Full path for CSV file
+    :param chunksize: Number of rows to read at a time.
+           Default: read all at once
 
-        # Reformat to float for state fund
-        df_select = state_fund_column_conversion(df_select)
+    :return: Iterator of pandas dataframe for each chunk
+    """
 
-        print(f"Writing: {out_file}")
-        df_select.to_csv(out_file, index=False)
+    if chunksize is None:
+        return iter([pd.read_csv(filename)])
+    else:
+        return iter(pd.read_csv(filename, chunksize=chunksize))
 
 
-def salary_column_conversion(df: pd.DataFrame, regex: str) -> pd.DataFrame:
+def salary_column_conversion(df: pd.DataFrame, regex: str,
+                             verbose: bool = True) -> pd.DataFrame:
     """
     Convert columns of salary that is currency formatted to text
 
     :param df: Salary pandas dataframe
     :param regex: regex to replace
+    :param verbose: Print conversion. Default: True
 
     :return: pandas dataframe with transformation
     """
 
     for s_column in SALARY_COLUMNS:
         if s_column in df.columns:
-            print(f"Convert {s_column} to float")
+            if verbose:
+                print(f"Convert {s_column} to float")
             salary_col = df[s_column].replace(regex, '', regex=True). \
                 astype(float)
             c_loc = df.columns.get_loc(s_column)  # save location
@@ -88,17 +153,20 @@ def salary_column_conversion(df: pd.DataFrame, regex: str) -> pd.DataFrame:
     return df
 
 
-def state_fund_column_conversion(df: pd.DataFrame) -> pd.DataFrame:
+def state_fund_column_conversion(df: pd.DataFrame,
+                                 verbose: bool = True) -> pd.DataFrame:
     """
     Change state fund data format from percentile to decimal
 
     :param df: Salary pandas dataframe
+    :param verbose: Print conversion. Default: True
 
     :return: pandas dataframe with transformation
     """
 
     if SF_COLUMN in df.columns:
-        print(f"Convert {SF_COLUMN} to float")
+        if verbose:
+            print(f"Convert {SF_COLUMN} to float")
         salary_col = df[SF_COLUMN].replace('%', '', regex=True).\
             astype(float) / 100.0
         c_loc = df.columns.get_loc(SF_COLUMN)  # save location
@@ -115,8 +183,95 @@ def write_file(filename: str, name_list: Union[list, set]):
             f.write(f"{val}\n")
 
 
-def write_csv_with_uid(data_dir: str):
-    """Write CSVs with uid included"""
+def file_checksum(filename: Union[str, Path]) -> str:
+    """Return SHA-256 hex digest of a file's content"""
+
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def stage_is_current(manifest_file: Path, stage: str,
+                     inputs: List[Union[str, Path]],
+                     options: Optional[dict] = None) -> bool:
+    """
+    Check manifest if a stage can be skipped: its inputs and options are
+    the same as its last run and its outputs are unchanged since
+
+    :param manifest_file: Full path of manifest
+    :param stage: Name of stage
+    :param inputs: Input files of stage
+    :param options: Options of stage that affect outputs
+
+    :return: True if stage can be skipped
+    """
+
+    if not manifest_file.exists():
+        return False
+
+    with open(manifest_file, 'r') as f:
+        record = json.load(f).get(stage)
+
+    if not record or record.get('options') != (options or {}):
+        return False
+
+    base = manifest_file.parent
+    checksums = {str(Path(f).resolve().relative_to(base.resolve())):
+                 file_checksum(f) for f in inputs}
+    if record['inputs'] != checksums:
+        return False
+
+    for f, checksum in record['outputs'].items():
+        if not (base / f).exists() or file_checksum(base / f) != checksum:
+            return False
+
+    return True
+
+
+def update_manifest(manifest_file: Path, stage: str,
+                    inputs: List[Union[str, Path]],
+                    outputs: List[Union[str, Path]],
+                    options: Optional[dict] = None):
+    """
+    Record content hashes of the inputs and outputs of a stage
+
+    :param manifest_file: Full path of manifest
+    :param stage: Name of stage
+    :param inputs: Input files of stage
+    :param outputs: Output files of stage
+    :param options: Options of stage that affect outputs
+    """
+
+    manifest = {}
+    if manifest_file.exists():
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+
+    base = manifest_file.parent.resolve()
+    manifest[stage] = {
+        'inputs': {str(Path(f).resolve().relative_to(base)): file_checksum(f)
+                   for f in inputs},
+        'outputs': {str(Path(f).resolve().relative_to(base)): file_checksum(f)
+                    for f in outputs},
+        'options': options or {},
+    }
+
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def write_csv_with_uid(data_dir: str, diagnostics: bool = True,
+                       fuzzy: bool = False, force: bool = False):
+    """
+    Write CSVs with uid included
+
+    :param data_dir: Full path containing FY*_clean.csv
+    :param diagnostics: Write lists of names as *.txt files. Default: True
+    :param fuzzy: Include fuzzy name matching. See set_unique_identifier
+    :param force: Run even if inputs and outputs are unchanged since last run
+    """
 
     p = Path(data_dir)  # Data path
     o = p / "uid"  # Output dir
@@ -125,26 +280,300 @@ def write_csv_with_uid(data_dir: str):
 
     list_files = sorted(p.glob('FY*_clean.csv'))
 
-    unique_df, df_dict = set_unique_identifier(list_files,
-                                               out_path=o)
+    manifest_file = p / MANIFEST_FILE
+    stage = 'write_csv_with_uid'
+    options = {'diagnostics': diagnostics, 'fuzzy': fuzzy}
+    if not force and stage_is_current(manifest_file, stage, list_files, options):
+        print(f"Skipping {stage}: inputs and outputs unchanged")
+        return
+
+    unique_df, df_dict = set_unique_identifier(list_files, out_path=o,
+                                               diagnostics=diagnostics,
+                                               fuzzy=fuzzy)
 
     unique_outfile = o / 'unique.csv'
     print(f"Writing: {unique_outfile}")
     unique_df[UNIQUE_COLUMN].to_csv(unique_outfile, index=False)
 
+    # Non-unique names of earliest fiscal year, for append_fiscal_year
+    name_counts = df_dict[list(df_dict)[0]]['Name'].value_counts()
+    non_unique_outfile = o / 'nonunique.csv'
+    print(f"Writing: {non_unique_outfile}")
+    pd.DataFrame({'Name': sorted(name_counts.index[name_counts >= 2])}).\
+        to_csv(non_unique_outfile, index=False)
+
+    outputs = [unique_outfile, non_unique_outfile]
     for fy in df_dict:
         fy_outfile = o / f"{fy}_clean.csv"
         print(f"Writing: {fy_outfile}")
         df_dict[fy].to_csv(fy_outfile, index=False)
+        outputs.append(fy_outfile)
+
+    update_manifest(manifest_file, stage, list_files, outputs, options)
+
+
+def append_fiscal_year(data_dir: str, filename: Union[str, Path],
+                       diagnostics: bool = True):
+    """
+    Add uid to a new fiscal year without processing previous years.
+    Existing uids are unchanged. Returning people get the new fiscal year
+    added to their years, and new people get uids after the largest uid.
+    Only the new fiscal year's table and unique.csv are written
+
+    :param data_dir: Data path with uid folder from write_csv_with_uid
+    :param filename: Full path for new fiscal year's clean CSV. This must
+           be later than all previous fiscal years
+    :param diagnostics: Write lists of names as *.txt files. Default: True
+    """
+
+    p = Path(filename)
+    o = Path(data_dir) / "uid"  # Output dir
+
+    fy = p.name.split('_')[0]
+    fy_outfile = o / f"{fy}_clean.csv"
+    if fy_outfile.exists():
+        raise ValueError(f"{fy} is already included: {fy_outfile}")
+
+    unique_outfile = o / 'unique.csv'
+    print(f"Reading: {unique_outfile}")
+    unique_df = pd.read_csv(unique_outfile)
+
+    non_unique_names = set()
+    non_unique_file = o / 'nonunique.csv'
+    if non_unique_file.exists():
+        non_unique_names.update(pd.read_csv(non_unique_file)['Name'])
+
+    print(f"Reading: {p}")
+    df = pd.read_csv(p)
+
+    name_list_1, _ = get_unique_names(o / p.name, df, diagnostics)
+
+    uid_index = unique_df.set_index('Name')['uid']
+    name_list_1_new, \
+        name_list_1_union = unique_match_id(o / p.name, name_list_1, uid_index,
+                                            diagnostics)
+    name_list_1_union2 = non_unique_check(o / p.name, name_list_1,
+                                          non_unique_names, diagnostics)
+
+    print(f"Number of unique records in unique_df: {len(name_list_1_union)}")
+    print(f"Number of new unique records: {len(name_list_1_new)}")
+    print(f"Number of new unique records that is non-unique of unique_df: "
+          f"{len(name_list_1_union2)}")
+
+    # Append year for returning unique names
+    idx = unique_df['Name'].isin(name_list_1_union)
+    unique_df.loc[idx, 'year'] += f";{fy}"
+
+    # Add new unique names with uid after the largest uid
+    name_list_1_new_clean = sorted(name_list_1_new - name_list_1_union2)
+    print(f"Adding {len(name_list_1_new_clean)} to unique_df ...")
+    uid_start = unique_df['uid'].max() + 1
+    new_df = pd.DataFrame({
+        'Name': name_list_1_new_clean,
+        'year': fy,
+        'uid': range(uid_start, uid_start + len(name_list_1_new_clean)),
+    })
+    unique_df = pd.concat([unique_df, new_df], ignore_index=True)
+    unique_df.sort_values(by='Name', inplace=True, ignore_index=True)
+
+    df['uid'] = df['Name'].map(unique_df.set_index('Name')['uid'])
+
+    print(f"Writing: {unique_outfile}")
+    unique_df[UNIQUE_COLUMN].to_csv(unique_outfile, index=False)
+
+    print(f"Writing: {fy_outfile}")
+    df.to_csv(fy_outfile, index=False)
+
+
+def write_feather_cache(data_dir: str, force: bool = False):
+    """
+    Convert cleaned CSVs (with uid) and unique.csv to Arrow IPC (feather)
+    files with a typed schema. These are memory-mapped by main.load_data.
+    The category dictionary shared across fiscal years is written to
+    categories.json
+
+    :param data_dir: Full path containing FY*_clean.csv and unique.csv
+    :param force: Run even if inputs and outputs are unchanged since last run
+    """
+
+    p = Path(data_dir)
+
+    list_files = sorted(p.glob('FY*_clean.csv'))
+    if (p / 'unique.csv').exists():
+        list_files.append(p / 'unique.csv')
+
+    manifest_file = p / MANIFEST_FILE
+    stage = 'write_feather_cache'
+    if not force and stage_is_current(manifest_file, stage, list_files):
+        print(f"Skipping {stage}: inputs and outputs unchanged")
+        return
+
+    df_dict = {}
+    for filename in list_files:
+        print(f"Reading: {filename}")
+        df_dict[filename] = pd.read_csv(filename)
+
+    categories = get_categories([df for filename, df in df_dict.items()
+                                 if filename.name != 'unique.csv'])
+    categories_outfile = p / 'categories.json'
+    print(f"Writing: {categories_outfile}")
+    with open(categories_outfile, 'w') as f:
+        json.dump(categories, f, indent=1)
+
+    outputs = [categories_outfile]
+    for filename, df in df_dict.items():
+        if filename.name == 'unique.csv':
+            df = apply_schema(df, UNIQUE_DTYPES)
+        else:
+            df = apply_schema(df, DATA_DTYPES, categories)
+
+        # Uncompressed so that it can be memory-mapped
+        outfile = filename.with_suffix('.feather')
+        print(f"Writing: {outfile}")
+        df.to_feather(outfile, compression='uncompressed')
+        outputs.append(outfile)
+
+    update_manifest(manifest_file, stage, list_files, outputs)
+
+
+def write_summary_tables(data_dir: str, force: bool = False):
+    """
+    Write salary statistics (count, mean, std, min, percentiles, max) of
+    each fiscal year for all of campus, and each College Location, College
+    and Department. These are used by commons.get_summary_data instead of
+    computing the statistics for each page view. Annual salaries are used.
+    Missing College Location is 'N/A'
+
+    :param data_dir: Full path containing FY*_clean.csv
+    :param force: Run even if inputs and outputs are unchanged since last run
+    """
+
+    p = Path(data_dir)
+
+    list_files = sorted(p.glob('FY*_clean.csv'))
+
+    manifest_file = p / MANIFEST_FILE
+    stage = 'write_summary_tables'
+    if not force and stage_is_current(manifest_file, stage, list_files):
+        print(f"Skipping {stage}: inputs and outputs unchanged")
+        return
+
+    outputs = []
+    for filename in list_files:
+        print(f"Reading: {filename}")
+        df = pd.read_csv(filename)
+
+        summary_df = get_summary_table(df)
+
+        outfile = filename.with_name(filename.name.replace('_clean', '_summary'))
+        print(f"Writing: {outfile}")
+        summary_df.to_csv(outfile)
+        outputs.append(outfile)
+
+    update_manifest(manifest_file, stage, list_files, outputs)
+
+
+def get_summary_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Get salary statistics for all of campus, and for each group of
+    SUMMARY_LEVELS available in df
+
+    :param df: Salary pandas dataframe
+
+    :return: DataFrame indexed by level and group
+    """
+
+    salary = df[SALARY_COLUMN]
+
+    all_df = salary.describe(percentiles=SUMMARY_PERCENTILES).to_frame('All').T
+    all_df.index = pd.MultiIndex.from_tuples([('All', 'All')])
+    df_list = [all_df]
+    for level in SUMMARY_LEVELS:
+        if level not in df.columns:
+            continue
+        group = df[level].astype(object)
+        if level != 'College Location' and group.isnull().all():
+            continue
+        if level == 'College Location':
+            group = group.where(group.notnull(), 'N/A')
+        t_df = salary.groupby(group).describe(percentiles=SUMMARY_PERCENTILES)
+        t_df.index = pd.MultiIndex.from_product([[level], t_df.index])
+        df_list.append(t_df)
+
+    summary_df = pd.concat(df_list)
+    summary_df.index.names = ['level', 'group']
+    return summary_df
+
+
+def get_categories(df_list: List[pd.DataFrame]) -> Dict[str, list]:
+    """
+    Get category dictionary shared across fiscal years for categorical
+    columns of DATA_DTYPES
+
+    :param df_list: List of salary pandas dataframes
+
+    :return: Dictionary of column names and sorted categories
+    """
+
+    categories = {}
+    for col, dtype in DATA_DTYPES.items():
+        if dtype == 'category':
+            values = set()
+            for df in df_list:
+                if col in df.columns:
+                    values.update(df[col].dropna().unique())
+            categories[col] = sorted(values, key=str)
+    return categories
+
+
+def apply_schema(df: pd.DataFrame, dtypes: dict,
+                 categories: Optional[Dict[str, list]] = None) -> pd.DataFrame:
+    """
+    Cast columns to the types of a schema. Columns that are not available
+    (e.g., College Name for older fiscal years) are skipped
+
+    :param df: Salary pandas dataframe
+    :param dtypes: Dictionary of column names and types
+    :param categories: Shared category dictionary from get_categories.
+           If not provided, categories are inferred from df
+
+    :return: pandas dataframe with transformation
+    """
+
+    select_dtypes = {}
+    for col, dtype in dtypes.items():
+        if col in df.columns:
+            if dtype == 'category' and categories and col in categories:
+                dtype = pd.CategoricalDtype(categories[col])
+            select_dtypes[col] = dtype
+    return df.astype(select_dtypes)
 
 
 def set_unique_identifier(list_files: List[Union[str, Path]],
-                          out_path: Path = None) -> \
+                          out_path: Path = None, diagnostics: bool = True,
+                          fuzzy: bool = False) -> \
         Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
-    """Set unique identifiers for each person, updating tables"""
+    """
+    Set unique identifiers for each person, updating tables
 
-    unique_df = pd.DataFrame()
-    non_unique_df = pd.DataFrame()
+    Names are tracked with a hash index of name -> list of fiscal years,
+    so each fiscal year is matched in a single pass
+
+    :param list_files: Clean CSV for each fiscal year, earliest first
+    :param out_path: Output path for lists of names
+    :param diagnostics: Write lists of names as *.txt files. Default: True
+    :param fuzzy: Link new names to previous names with a different format
+           (e.g., "Smith,John A" and "Smith,John") with fuzzy_match.
+           Default: False
+    """
+
+    years_index: Dict[str, List[str]] = {}  # Unique names and their years
+    non_unique_names = set()  # Non-unique names of earliest fiscal year
+    new_names_dict: Dict[str, set] = {}  # New unique names for each year
+
+    aliases: Dict[str, str] = {}  # Fuzzy matched name -> name in unique_df
+    year_aliases: Dict[str, Dict[str, str]] = {}  # Aliases matched each year
+    info_index: Dict[str, tuple] = {}  # Latest (Department, Primary Title)
 
     df_dict = {}
 
@@ -163,26 +592,24 @@ def set_unique_identifier(list_files: List[Union[str, Path]],
         df_dict[fy] = df
 
         # Get unique names for current dataframe
-        name_list_1, name_list_2 = get_unique_names(o, df)
+        name_list_1, name_list_2 = get_unique_names(o, df, diagnostics)
+
+        if fuzzy:
+            year_info = get_name_info(df, name_list_1)
 
         if ii == 0:
             # Initialize with earliest fiscal year data
-            unique_df = append_to_df(df, unique_df, name_list_1, year=fy)
-            non_unique_df = append_to_df(df, non_unique_df, name_list_2,
-                                         year=fy)
+            name_list_1_new_clean = name_list_1
+            non_unique_names.update(name_list_2)
         else:
-            # Get latest unique names match from continuously updated unique_df
-            unique_names0 = unique_df['Name']
-            non_unique_names0 = non_unique_df['Name']
-
             # Identify existing unique matches and get list of new matches
             name_list_1_new, \
                 name_list_1_union = unique_match_id(o, name_list_1,
-                                                    unique_names0)
+                                                    years_index, diagnostics)
 
             # Check against non-unique
             name_list_1_union2 = non_unique_check(o, name_list_1,
-                                                  non_unique_names0)
+                                                  non_unique_names, diagnostics)
 
             print(f"Number of unique records in unique_df: "
                   f"{len(name_list_1_union)}")
@@ -197,74 +624,229 @@ def set_unique_identifier(list_files: List[Union[str, Path]],
             )
 
             # Append year for unique names in previous years
-            if len(name_list_1_union) > 0:
-                idx = unique_df['Name'].isin(name_list_1)
-                unique_df.loc[idx, 'year'] += f";{fy}"
+            for name in name_list_1_union:
+                years_index[name].append(fy)
+
+            if fuzzy:
+                t0 = perf_counter()
+
+                # Names matched in previous years
+                seen = set(name_list_1_union)
+                matches = {name: aliases[name] for name in name_list_1_new_clean
+                           if name in aliases and aliases[name] not in seen}
+                seen.update(matches.values())
+
+                candidates = [name for name in years_index if name not in seen]
+                new_names = [name for name in name_list_1_new_clean
+                             if name not in aliases]
+                fuzzy_matches, n_compare = \
+                    fuzzy_match(new_names, candidates, year_info, info_index)
+                aliases.update(fuzzy_matches)
+                matches.update(fuzzy_matches)
+
+                for name, match in matches.items():
+                    years_index[match].append(fy)
+                    info_index[match] = year_info[name]
+                year_aliases[fy] = matches
+
+                # Previously matched names of a person already in this year
+                # are left without uid
+                name_list_1_new_clean = [name for name in name_list_1_new_clean
+                                         if name not in aliases]
+
+                print(f"Number of fuzzy matches: {len(fuzzy_matches)} "
+                      f"({n_compare} comparisons, {perf_counter() - t0:.2f}s)")
+                print(f"Number of previous fuzzy matches: "
+                      f"{len(matches) - len(fuzzy_matches)}")
 
-            # Append to unique_df entirely new records
             if len(name_list_1_new_clean) > 0:
                 print(f"Adding {len(name_list_1_new_clean)} to unique_df ...")
-                unique_df = append_to_df(df, unique_df, name_list_1_new_clean,
-                                         year=fy)
+
+        # Add entirely new records
+        for name in name_list_1_new_clean:
+            years_index[name] = [fy]
+        new_names_dict[fy] = set(name_list_1_new_clean)
+
+        if fuzzy:
+            for name in name_list_1:
+                if name in years_index:
+                    info_index[name] = year_info[name]
+
+    # Gather records of each name from the fiscal year it was first seen
+    df_list = []
+    for fy, new_names in new_names_dict.items():
+        df = df_dict[fy]
+        temp_df = df.loc[df['Name'].isin(new_names)].copy()
+        temp_df.insert(len(temp_df.columns), 'year',
+                       [';'.join(years_index[name]) for name in temp_df['Name']])
+        df_list.append(temp_df)
+    unique_df = pd.concat(df_list, ignore_index=True)
 
     # Sort unique_df and include uid
     unique_df.sort_values(by='Name', inplace=True, ignore_index=True)
     unique_df['uid'] = unique_df.index + 1
 
-    # Update dataframe with uid
-    for fy in df_dict:
-        df_update = df_dict[fy]
-        df_merge = pd.merge(df_update, unique_df, how='left', on=['Name'],
-                            suffixes=['', '_B'])
-        df_update['uid'] = df_merge['uid']
-        df_dict[fy] = df_update
+    # Update dataframe with uid. Aliases only have the uid of their match
+    # in fiscal years where they were matched
+    uid_index = unique_df.set_index('Name')['uid']
+    for fy, df in df_dict.items():
+        uid = df['Name'].map(uid_index)
+        if year_aliases.get(fy):
+            alias_uid = pd.Series(year_aliases[fy]).map(uid_index)
+            uid = uid.fillna(df['Name'].map(alias_uid))
+        df['uid'] = uid
 
     return unique_df, df_dict
 
 
-def append_to_df(df: pd.DataFrame, new_df: pd.DataFrame, name_list_1: list,
-                 year: str = ''):
-    """Append to dataframe from a list of names"""
-    temp_df = df.loc[df['Name'].isin(name_list_1)]
-    if year:
-        temp_df.insert(len(temp_df.columns), 'year', year)
+def normalize_name(name: str) -> Tuple[str, List[str]]:
+    """
+    Normalize "LastName,FirstName MiddleName" to lowercase without
+    punctuation
+
+    :param name: Name
+
+    :return: Last name, and list of first and middle names
+    """
+
+    last, _, given = name.lower().partition(',')
+    last = re.sub('[^a-z0-9]', '', last)
+    given_list = re.sub('[^a-z0-9 ]', ' ', given).split()
+    return last, given_list
+
+
+def compare_given_names(given_list1: List[str], given_list2: List[str]) -> int:
+    """
+    Compare first and middle names. First names must be the same. Middle
+    names can be missing or an initial
+
+    :return: Number of the same names. 0 if not compatible
+    """
+
+    if not given_list1 or not given_list2 or given_list1[0] != given_list2[0]:
+        return 0
+
+    score = 1
+    for g1, g2 in zip(given_list1[1:], given_list2[1:]):
+        if g1 == g2:
+            score += 1
+        elif g1[0] != g2[0] or min(len(g1), len(g2)) > 1:
+            return 0
+    return score
 
-    new_df = new_df.append(temp_df, ignore_index=True)
-    return new_df
 
+def get_name_info(df: pd.DataFrame, name_list: list) -> Dict[str, tuple]:
+    """Get (Department, Primary Title) for each name"""
 
-def get_unique_names(file_path: Path, df: pd.DataFrame) -> Tuple[list, list]:
-    """Get unique and non-unique_names"""
+    t_df = df.loc[df['Name'].isin(name_list)]
+    columns = [t_df[col] if col in t_df.columns else [None] * len(t_df)
+               for col in ['Department', 'Primary Title']]
+    return dict(zip(t_df['Name'], zip(*columns)))
+
+
+def fuzzy_match(new_names: List[str], candidate_names: List[str],
+                new_info: Dict[str, tuple] = None,
+                candidate_info: Dict[str, tuple] = None) -> \
+        Tuple[Dict[str, str], int]:
+    """
+    Match new names to candidate names of the same person with different
+    formatting (case, punctuation, missing middle name or initial). Only
+    candidates with the same normalized last name are compared (blocking).
+    Unless the normalized names are the same, Department must be the same.
+    Ties are broken by Department, then Primary Title. Names with
+    remaining ties, or candidates matched by more than one name, are not
+    matched
+
+    :param new_names: Names to match
+    :param candidate_names: Names to match against
+    :param new_info: (Department, Primary Title) of new names
+    :param candidate_info: (Department, Primary Title) of candidate names
+
+    :return: Dictionary of new name -> candidate name, and number of
+             comparisons
+    """
 
-    unique_names = df['Name'].value_counts().\
-        sort_index(key=lambda x: x.str.lower())
+    new_info = new_info or {}
+    candidate_info = candidate_info or {}
+
+    blocks = defaultdict(list)
+    for name in candidate_names:
+        last, given_list = normalize_name(name)
+        blocks[last].append((name, given_list))
+
+    proposals = defaultdict(list)  # Candidate -> new names
+    n_compare = 0
+    for name in new_names:
+        last, given_list = normalize_name(name)
+        info = new_info.get(name, (None, None))
+
+        best_score = None
+        best_names = []
+        for c_name, c_given_list in blocks.get(last, []):
+            n_compare += 1
+            score = compare_given_names(given_list, c_given_list)
+            if score == 0:
+                continue
+            c_info = candidate_info.get(c_name, (None, None))
+            if given_list != c_given_list and info[0] != c_info[0]:
+                continue
+            score = (score, info[0] == c_info[0], info[1] == c_info[1])
+            if best_score is None or score > best_score:
+                best_score, best_names = score, [c_name]
+            elif score == best_score:
+                best_names.append(c_name)
+
+        if len(best_names) == 1:
+            proposals[best_names[0]].append(name)
+
+    matches = {new_list[0]: c_name for c_name, new_list in proposals.items()
+               if len(new_list) == 1}
+    return matches, n_compare
+
+
+def get_unique_names(file_path: Path, df: pd.DataFrame,
+                     diagnostics: bool = True) -> Tuple[list, list]:
+    """Get unique and non-unique_names, optionally write files"""
+
+    unique_names = df['Name'].value_counts()
+    if diagnostics:
+        # Sorted only for the files
+        unique_names = unique_names.sort_index(key=lambda x: x.str.lower())
 
     # Start with single occurrence
     name_list_1 = unique_names.loc[unique_names == 1].index.to_list()
     name_list_2 = unique_names.loc[unique_names >= 2].index.to_list()
     print(f"Number of unique records by name: {len(name_list_1)}")
     print(f"Number of records with duplicate names: {len(name_list_2)}")
-    write_file(str(file_path).replace('.csv', '_unique.txt'), name_list_1)
-    write_file(str(file_path).replace('.csv', '_nonunique.txt'), name_list_2)
+    if diagnostics:
+        write_file(str(file_path).replace('.csv', '_unique.txt'), name_list_1)
+        write_file(str(file_path).replace('.csv', '_nonunique.txt'), name_list_2)
 
     return name_list_1, name_list_2
 
 
-def unique_match_id(out_path, name_list_1, unique_names0):
-    """Cross-match names against unique with set operations, write files"""
-    name_list_1_union = set(set(name_list_1) & set(unique_names0))
-    name_list_1_new = set(set(name_list_1) - set(unique_names0))
-    write_file(str(out_path).replace('.csv', '_unique_union.txt'),
-               name_list_1_union)
-    write_file(str(out_path).replace('.csv', '_unique_new.txt'),
-               name_list_1_new)
+def unique_match_id(out_path, name_list_1, unique_names0,
+                    diagnostics: bool = True):
+    """Cross-match names against unique with hash lookups, optionally write
+    files"""
+    name_list_1_union = {name for name in name_list_1 if name in unique_names0}
+    name_list_1_new = set(name_list_1) - name_list_1_union
+    if diagnostics:
+        write_file(str(out_path).replace('.csv', '_unique_union.txt'),
+                   name_list_1_union)
+        write_file(str(out_path).replace('.csv', '_unique_new.txt'),
+                   name_list_1_new)
 
     return name_list_1_new, name_list_1_union
 
 
-def non_unique_check(out_path, name_list_1, non_unique_names0):
-    """Cross-match names against non-unique with set operations, write file"""
-    name_list_1_union2 = set(set(name_list_1) & set(non_unique_names0))
-    write_file(str(out_path).replace('.csv', '_unique_union2.txt'),
-               name_list_1_union2)
+def non_unique_check(out_path, name_list_1, non_unique_names0,
+                     diagnostics: bool = True):
+    """Cross-match names against non-unique with hash lookups, optionally
+    write file"""
+    name_list_1_union2 = {name for name in name_list_1
+                          if name in non_unique_names0}
+    if diagnostics:
+        write_file(str(out_path).replace('.csv', '_unique_union2.txt'),
+                   name_list_1_union2)
     return name_list_1_union2
@@ -0,0 +1,436 @@
+import json
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from threading import RLock
+from time import sleep, time
+from typing import Dict, Iterator, List, Optional, Union
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from uuid import uuid4
+
+import pandas as pd
+from pyarrow import feather
+
+from analysis import GroupIndex, HistogramPyramid, build_panel
+from constants import FY_LIST, DATA_DTYPES, UNIQUE_DTYPES, FISCAL_HOURS
+from etl import MANIFEST_FILE, apply_schema, file_checksum
+
+# Dropbox file IDs for each table
+DROPBOX_FILE_ID = {
+    'FY2019-20_clean': 'utro67qeoejfdto',
+    'FY2018-19_clean': 'qr6sc8fmox3ub0d',
+    'FY2017-18_clean': '4vepwl7mrvumzzg',
+    'FY2016-17_clean': 'dg62bj2y8gfdaog',
+    'FY2014-15_clean': 'tlo9xvhl949uj3d',
+    'FY2013-14_clean': '9d2vespez2ct068',
+    'FY2011-12_clean': 'a4uf4astkt2lc5z',
+    'unique': 'l99ejnpj3e0qqy7',
+}
+
+CACHE_DIR = Path.home() / '.cache' / 'sapp4ua'  # Local download cache
+
+MAX_CONNECTIONS = 4  # Number of concurrent downloads
+TIMEOUT = 30  # Seconds per download attempt
+RETRIES = 3  # Attempts per file
+CACHE_MAX_AGE = 3600  # Seconds before a cached file is checked against source
+
+MEMORY_BUDGET = 256  # Memory budget in MB for fiscal years held by YearStore
+PANEL_KEY = 'panel'  # Key of panel among fiscal years held by YearStore
+
+
+def table_url(name: str, url: str = '') -> str:
+    """
+    Return download URL for a table
+
+    :param name: Table name without extension, e.g., 'FY2019-20_clean'
+    :param url: Base URL of a server hosting the CSVs (e.g., a local
+           stand-in server). Default: Dropbox
+    """
+    if url:
+        return f'{url.rstrip("/")}/{name}.csv'
+    else:
+        return f'https://www.dropbox.com/s/{DROPBOX_FILE_ID[name]}/{name}.csv?dl=1'
+
+
+def fetch_url(url: str, cache_file: Path, timeout: float = TIMEOUT,
+              retries: int = RETRIES, backoff: float = 1.0,
+              max_age: float = CACHE_MAX_AGE) -> Path:
+    """
+    Download a file into the local cache, with retries. A cached file is
+    reused if its content matches the checksum recorded at download time.
+    After max_age, it is checked against the source with its ETag and
+    Last-Modified, and downloaded again only if the source changed. If the
+    source can not be reached, a cached file is used. Client errors (4xx)
+    are not retried
+
+    :param url: URL to download
+    :param cache_file: Full path of cached file
+    :param timeout: Timeout in seconds for each attempt
+    :param retries: Number of attempts
+    :param backoff: Seconds to wait after first failed attempt. Doubles
+           after each failure
+    :param max_age: Seconds that a cached file is used without checking
+           the source. 0 to always check
+
+    :return: Path of cached file
+    """
+
+    # Checksum, validators of source, and time of last check
+    info_file = cache_file.with_name(f'{cache_file.name}.json')
+    info = {}
+    if cache_file.exists() and info_file.exists():
+        info = json.loads(info_file.read_text())
+        if file_checksum(cache_file) != info.get('sha256'):
+            print(f"Checksum mismatch for cached {cache_file}. Downloading again")
+            info = {}
+        elif time() - info.get('checked', 0) < max_age:
+            return cache_file
+
+    headers = {}
+    if info.get('etag'):
+        headers['If-None-Match'] = info['etag']
+    if info.get('last_modified'):
+        headers['If-Modified-Since'] = info['last_modified']
+
+    content = None
+    for attempt in range(1, retries + 1):
+        try:
+            with urlopen(Request(url, headers=headers),
+                         timeout=timeout) as response:
+                content = response.read()
+                response_headers = response.headers
+            break
+        except HTTPError as err:
+            if err.code == 304:  # Not modified since cached
+                break
+            if 400 <= err.code < 500:
+                raise
+            error = err
+        except (URLError, OSError) as err:
+            error = err
+
+        if attempt == retries:
+            if info:
+                print(f"Using cached {cache_file}. Failed to check {url}: {error}")
+                return cache_file
+            raise error
+        print(f"Attempt {attempt}/{retries} failed for {url}: {error}")
+        sleep(backoff * 2 ** (attempt - 1))
+
+    if content is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so an interrupted write is never
+        # reused
+        temp_file = cache_file.with_name(f'{cache_file.name}.part')
+        temp_file.write_bytes(content)
+        temp_file.replace(cache_file)
+        info = {
+            'sha256': file_checksum(cache_file),
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+        }
+    info['checked'] = time()
+    info_file.write_text(json.dumps(info))
+
+    return cache_file
+
+
+@lru_cache(maxsize=64)
+def _file_checksum(filename: str, mtime_ns: int, size: int) -> str:
+    return file_checksum(filename)
+
+
+def _checksum(filename: Path) -> Optional[str]:
+    # Computed again only for modified files. None for missing files
+    if not filename.exists():
+        return None
+    stat = filename.stat()
+    return _file_checksum(str(filename), stat.st_mtime_ns, stat.st_size)
+
+
+def manifest_is_current(local: str, stage: str, name: str,
+                        inputs: Optional[List[str]] = None) -> bool:
+    """
+    Check manifest if an output file of an etl stage is unchanged, and its
+    input files are unchanged since
+
+    :param local: Local path
+    :param stage: Name of stage, e.g., 'write_feather_cache'
+    :param name: Output file name, e.g., 'FY2019-20_clean.feather'
+    :param inputs: Input file names to check. Default: all inputs of stage
+    """
+
+    p = Path(local)
+    manifest_file = p / MANIFEST_FILE
+    if not (p / name).exists() or not manifest_file.exists():
+        return False
+
+    with open(manifest_file, 'r') as f:
+        record = json.load(f).get(stage)
+    if not record or record['outputs'].get(name) != _checksum(p / name):
+        return False
+
+    if inputs is None:
+        inputs = list(record['inputs'])
+    return all(f in record['inputs'] and record['inputs'][f] == _checksum(p / f)
+               for f in inputs)
+
+
+def feather_is_current(local: str, name: str) -> bool:
+    """
+    Check manifest if a file written by etl.write_feather_cache (feather
+    file or categories.json) is unchanged, and its CSVs are unchanged since.
+    A feather file without its CSV is used as is
+
+    :param local: Local path
+    :param name: File name, e.g., 'FY2019-20_clean.feather'
+    """
+
+    p = Path(local)
+    csv_name = Path(name).with_suffix('.csv').name
+    if name.endswith('.feather') and (p / name).exists() and \
+            not (p / csv_name).exists():
+        return True
+
+    # Categories are of all fiscal years, a feather file only of its CSV
+    if name.endswith('.feather'):
+        inputs = [csv_name]
+    else:
+        inputs = [f.name for f in p.glob('FY*_clean.csv')]
+    return manifest_is_current(local, 'write_feather_cache', name, inputs)
+
+
+def summary_is_current(local: str, name: str) -> bool:
+    """
+    Check manifest if a FY*_summary.csv of etl.write_summary_tables is
+    unchanged, and its FY*_clean.csv is unchanged since
+
+    :param local: Local path
+    :param name: File name, e.g., 'FY2019-20_summary.csv'
+    """
+    return manifest_is_current(local, 'write_summary_tables', name,
+                               [name.replace('_summary', '_clean')])
+
+
+def read_table(name: str, local: str = '', url: str = '',
+               cache_dir: Union[str, Path] = CACHE_DIR,
+               categories: Optional[Dict[str, list]] = None) -> pd.DataFrame:
+    """
+    Read a table and apply the schema of DATA_DTYPES (or UNIQUE_DTYPES).
+    For a local source, use the memory-mapped Arrow IPC (feather) version
+    from etl.write_feather_cache when it is current (see
+    feather_is_current), otherwise fall back to the CSV. Remote CSVs are
+    downloaded through the local cache
+
+    :param name: Table name without extension, e.g., 'FY2019-20_clean'
+    :param local: Local path
+    :param url: Base URL of a server hosting the CSVs. Default: Dropbox
+    :param cache_dir: Local download cache
+    :param categories: Shared category dictionary from read_categories
+    """
+    if local:
+        feather_file = Path(local) / f'{name}.feather'
+        if feather_is_current(local, feather_file.name):
+            df = feather.read_table(feather_file, memory_map=True).to_pandas()
+        else:
+            df = pd.read_csv(f'{local}/{name}.csv')
+    else:
+        cache_file = fetch_url(table_url(name, url), Path(cache_dir) / f'{name}.csv')
+        df = pd.read_csv(cache_file)
+
+    if name == 'unique':
+        return apply_schema(df, UNIQUE_DTYPES)
+    else:
+        return apply_schema(df, DATA_DTYPES, categories)
+
+
+def read_categories(local: str = '') -> Optional[Dict[str, list]]:
+    """
+    Read category dictionary shared across fiscal years
+    (categories.json from etl.write_feather_cache). Only available for a
+    local source, when it is current (see feather_is_current). Without it,
+    categories are inferred for each year
+    """
+    categories_file = Path(local) / 'categories.json'
+    if local and feather_is_current(local, categories_file.name):
+        with open(categories_file, 'r') as f:
+            return json.load(f)
+
+
+def read_summary(name: str, local: str = '') -> Optional[pd.DataFrame]:
+    """
+    Read precomputed salary statistics (FY*_summary.csv from
+    etl.write_summary_tables), indexed by level and group. Only available
+    for a local source, when it is current (see summary_is_current).
+    Otherwise statistics are computed from the fiscal year
+
+    :param name: Table name without extension, e.g., 'FY2019-20_summary'
+    :param local: Local path
+    """
+    summary_file = Path(local) / f'{name}.csv'
+    if local and summary_is_current(local, summary_file.name):
+        # Missing College Location is the group 'N/A', not a missing value
+        return pd.read_csv(summary_file, index_col=['level', 'group'],
+                           keep_default_na=False, na_values=[''])
+
+
+class YearStore(Mapping):
+    """
+    Read-only mapping of fiscal year to DataFrame that loads each year on
+    first access. Recently used years and the panel are kept in memory
+    under a memory budget, with the least recently used evicted first. The
+    most recently used is always kept
+
+    :param local: Local path
+    :param url: Base URL of a server hosting the CSVs. Default: Dropbox
+    :param cache_dir: Local download cache
+    :param memory_budget: Memory budget in MB
+    """
+
+    def __init__(self, local: str = '', url: str = '',
+                 cache_dir: Union[str, Path] = CACHE_DIR,
+                 memory_budget: float = MEMORY_BUDGET):
+        self.local = local
+        self.url = url
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget * 1024 ** 2
+
+        self.categories = read_categories(local)
+
+        # Identity of the data of this store, for keys of cached figures
+        self.data_id = uuid4().hex
+
+        self._fy_list = [year.split(' ')[0] for year in FY_LIST]
+        self._tables: OrderedDict = OrderedDict()
+        self._nbytes: Dict[str, int] = {}
+        self._summaries: Dict[str, Optional[pd.DataFrame]] = {}
+        self._group_indexes: Dict[str, GroupIndex] = {}
+        self._histograms: Dict[str, Dict[int, HistogramPyramid]] = {}
+        self._lock = RLock()  # Streamlit sessions run on separate threads
+
+    def __getitem__(self, fy: str) -> pd.DataFrame:
+        if fy not in self._fy_list:
+            raise KeyError(fy)
+
+        with self._lock:
+            if fy in self._tables:
+                self._tables.move_to_end(fy)
+                return self._tables[fy]
+
+            print(f"Loading: {fy}")
+            df = read_table(f'{fy}_clean', local=self.local, url=self.url,
+                            cache_dir=self.cache_dir,
+                            categories=self.categories)
+            self._tables[fy] = df
+            self._nbytes[fy] = int(df.memory_usage(deep=True).sum())
+            self._evict()
+            return df
+
+    def summary(self, fy: str) -> Optional[pd.DataFrame]:
+        """Precomputed salary statistics for a fiscal year (see
+        read_summary). None if not available. These are small, so they are
+        kept in memory"""
+        if fy not in self._fy_list:
+            raise KeyError(fy)
+
+        with self._lock:
+            if fy not in self._summaries:
+                self._summaries[fy] = read_summary(f'{fy}_summary',
+                                                   local=self.local)
+            return self._summaries[fy]
+
+    def group_index(self, fy: str) -> GroupIndex:
+        """Row positions of each group for a fiscal year (see
+        analysis.GroupIndex). Counted with the fiscal year against the
+        memory budget, and evicted with it"""
+        with self._lock:
+            df = self[fy]
+            if fy not in self._group_indexes:
+                self._group_indexes[fy] = GroupIndex(df)
+                self._add_nbytes(fy, self._group_indexes[fy].nbytes)
+            return self._group_indexes[fy]
+
+    def histograms(self, fy: str, pay_norm: int) -> HistogramPyramid:
+        """Cumulative numbers of salaries for histograms of a fiscal year
+        (see analysis.HistogramPyramid). Annual and hourly are built
+        together on first access. Counted with the fiscal year against the
+        memory budget, and evicted with it"""
+        with self._lock:
+            df = self[fy]
+            if fy not in self._histograms:
+                self._histograms[fy] = {}
+            for norm in {1, FISCAL_HOURS[fy], pay_norm}:
+                if norm not in self._histograms[fy]:
+                    self._histograms[fy][norm] = HistogramPyramid(
+                        df, norm, self.group_index(fy))
+                    self._add_nbytes(fy, self._histograms[fy][norm].nbytes)
+            return self._histograms[fy][pay_norm]
+
+    @property
+    def panel(self) -> pd.DataFrame:
+        """Records of all fiscal years indexed by uid and fiscal year (see
+        analysis.build_panel). Built on first access, and counted against
+        the memory budget like a fiscal year. If evicted, it is rebuilt
+        from all fiscal years on the next access"""
+        with self._lock:
+            if PANEL_KEY in self._tables:
+                self._tables.move_to_end(PANEL_KEY)
+                return self._tables[PANEL_KEY]
+
+            print("Building panel")
+            panel = build_panel(self)
+            self._tables[PANEL_KEY] = panel
+            self._nbytes[PANEL_KEY] = int(panel.memory_usage(deep=True).sum())
+            self._evict()
+            return panel
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fy_list)
+
+    def __len__(self) -> int:
+        return len(self._fy_list)
+
+    def __contains__(self, fy) -> bool:
+        return fy in self._fy_list
+
+    @property
+    def loaded(self) -> list:
+        """Fiscal years in memory, least recently used first"""
+        return [fy for fy in self._tables if fy in self._fy_list]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory usage in bytes of fiscal years in memory, with their
+        group indexes and histograms, and panel"""
+        return sum(self._nbytes.values())
+
+    def _add_nbytes(self, fy: str, nbytes: int):
+        self._nbytes[fy] += nbytes
+        self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.memory_budget and len(self._tables) > 1:
+            key, _ = self._tables.popitem(last=False)
+            self._nbytes.pop(key)
+            self._group_indexes.pop(key, None)
+            self._histograms.pop(key, None)
+            print(f"Evicting: {key}")
+
+    def prefetch(self, max_workers: int = MAX_CONNECTIONS):
+        """Download every fiscal year and unique names into the local cache
+        concurrently, without parsing. Nothing to do for a local source"""
+        if self.local:
+            return
+
+        names = [f'{fy}_clean' for fy in self._fy_list] + ['unique']
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(fetch_url, table_url(name, self.url),
+                                Path(self.cache_dir) / f'{name}.csv')
+                for name in names
+            ]
+            for future in futures:
+                future.result()
@@ -4,50 +4,44 @@ import argparse
 import streamlit as st
 from streamlit.components.v1 import html
 
-import pandas as pd
-
-from constants import COLLEGE_NAME, FY_LIST, TITLE
+from analysis import NameIndex
+from constants import COLLEGE_NAME, TITLE
+import loader
 import sidebar
 import views
 
 
-@st.cache
-def load_data(local: str = ''):
-    """Load data"""
+@st.cache(allow_output_mutation=True)
+def load_data(local: str = '', url: str = '', cache_dir: str = '',
+              memory_budget: float = loader.MEMORY_BUDGET):
+    """Load data. Fiscal years are loaded on first access"""
     if local:
         print("Loading data from local source")
+    elif url:
+        print(f"Loading data from {url}")
     else:
         print("Loading data from Dropbox")
 
-    file_id = {
-        'FY2019-20': 'utro67qeoejfdto',
-        'FY2018-19': 'qr6sc8fmox3ub0d',
-        'FY2017-18': '4vepwl7mrvumzzg',
-        'FY2016-17': 'dg62bj2y8gfdaog',
-        'FY2014-15': 'tlo9xvhl949uj3d',
-        'FY2013-14': '9d2vespez2ct068',
-        'FY2011-12': 'a4uf4astkt2lc5z',
-    }
-
-    data_dict = {}
-    for year in FY_LIST:
-        year_split = year.split(' ')[0]
-        if not local:
-            url = f'https://www.dropbox.com/s/{file_id[year_split]}/{year_split}_clean.csv?dl=1'
-        else:
-            url = f'{local}/{year_split}_clean.csv'
-        data_dict[year_split] = pd.read_csv(url)
-
-    # Get unique.csv
-    if not local:
-        unique_url = 'https://www.dropbox.com/s/l99ejnpj3e0qqy7/unique.csv?dl=1'
-    else:
-        unique_url = f'{local}/unique.csv'
-    unique_df = pd.read_csv(unique_url)
+    cache_dir = cache_dir or loader.CACHE_DIR
+    data_dict = loader.YearStore(local=local, url=url, cache_dir=cache_dir,
+                                 memory_budget=memory_budget)
+    data_dict.prefetch()  # Also downloads unique names
+
+    unique_df = loader.read_table('unique', local=local, url=url,
+                                  cache_dir=cache_dir)
 
     return data_dict, unique_df
 
 
+@st.cache(allow_output_mutation=True)
+def load_name_index(local: str = '', url: str = '', cache_dir: str = '',
+                    memory_budget: float = loader.MEMORY_BUDGET) -> NameIndex:
+    """Build name search index of Individual Search page once"""
+    data_dict, unique_df = load_data(local=local, url=url, cache_dir=cache_dir,
+                                     memory_budget=memory_budget)
+    return NameIndex(unique_df, panel=data_dict.panel)
+
+
 @st.cache
 def header_buttons() -> str:
     """Return white-background version of GitHub Sponsor button"""
@@ -58,7 +52,8 @@ def header_buttons() -> str:
     return buttons_html
 
 
-def main(bokeh=True, local: str = ''):
+def main(bokeh=True, local: str = '', url: str = '', cache_dir: str = '',
+         memory_budget: float = loader.MEMORY_BUDGET):
     st.set_page_config(page_title=f'{TITLE} - sapp4ua', layout='wide',
                        initial_sidebar_state='auto')
 
@@ -99,7 +94,8 @@ def main(bokeh=True, local: str = ''):
     )
 
     # Load data
-    data_dict, unique_df = load_data(local=local)
+    data_dict, unique_df = load_data(local=local, url=url, cache_dir=cache_dir,
+                                     memory_budget=memory_budget)
 
     # Sidebar, select data view
     view_select = sidebar.select_data_view()
@@ -138,33 +134,62 @@ def main(bokeh=True, local: str = ''):
         views.trends_page(data_dict, pay_norm)
 
     if view_select == 'Salary Summary':
-        views.salary_summary_page(df, pay_norm, bokeh=bokeh)
+        views.salary_summary_page(
+            df, pay_norm, bokeh=bokeh,
+            summary_df=data_dict.summary(fy_select),
+            group_index=data_dict.group_index(fy_select),
+            histograms=data_dict.histograms(fy_select, pay_norm),
+            fy_select=fy_select, data_id=data_dict.data_id)
 
     if view_select == 'Highest Earners':
-        views.highest_earners_page(df)
+        views.highest_earners_page(
+            df, group_index=data_dict.group_index(fy_select))
 
     # Select by College Name
     if view_select == 'College/Division Data':
-        views.subset_select_data_page(df, COLLEGE_NAME, 'college',
-                                      pay_norm, bokeh=bokeh)
+        views.subset_select_data_page(
+            df, COLLEGE_NAME, 'college', pay_norm, bokeh=bokeh,
+            summary_df=data_dict.summary(fy_select),
+            group_index=data_dict.group_index(fy_select),
+            histograms=data_dict.histograms(fy_select, pay_norm),
+            fy_select=fy_select, data_id=data_dict.data_id)
 
     # Select by Department Name
     if view_select == 'Department Data':
-        views.subset_select_data_page(df, 'Department', 'department',
-                                      pay_norm, bokeh=bokeh)
+        views.subset_select_data_page(
+            df, 'Department', 'department', pay_norm, bokeh=bokeh,
+            summary_df=data_dict.summary(fy_select),
+            group_index=data_dict.group_index(fy_select),
+            histograms=data_dict.histograms(fy_select, pay_norm),
+            fy_select=fy_select, data_id=data_dict.data_id)
 
     if view_select == 'Individual Search':
-        views.individual_search_page(data_dict, unique_df)
+        name_index = load_name_index(local=local, url=url,
+                                     cache_dir=cache_dir,
+                                     memory_budget=memory_budget)
+        views.individual_search_page(data_dict, unique_df,
+                                     panel=data_dict.panel,
+                                     name_index=name_index)
 
     if view_select == 'Wage Growth':
         views.wage_growth_page(data_dict, fy_select, pay_norm,
-                               bokeh=bokeh)
+                               bokeh=bokeh, panel=data_dict.panel,
+                               data_id=data_dict.data_id)
 
 
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser("Streamlit script")
     parser.add_argument('--local', default='', help='Local path to specify')
+    parser.add_argument('--url', default='',
+                        help='Base URL of server hosting CSVs. Default: Dropbox')
+    parser.add_argument('--cache-dir', default='',
+                        help=f'Download cache. Default: {loader.CACHE_DIR}')
+    parser.add_argument('--memory-budget', type=float,
+                        default=loader.MEMORY_BUDGET,
+                        help='Memory budget (MB) for fiscal years in memory. '
+                             f'Default: {loader.MEMORY_BUDGET}')
     args = parser.parse_args()
 
-    main(bokeh=True, local=args.local)
+    main(bokeh=True, local=args.local, url=args.url, cache_dir=args.cache_dir,
+         memory_budget=args.memory_budget)
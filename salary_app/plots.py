@@ -1,12 +1,23 @@
-from typing import Union, Optional
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from threading import RLock
+from typing import Union, Optional, Tuple
 
 import altair as alt
 import numpy as np
 import pandas as pd
 import streamlit as st
-from bokeh.models import PrintfTickFormatter, Label, Whisker
+from bokeh.embed import json_item
+from bokeh.models import PrintfTickFormatter, Label, LabelSet, Range1d, \
+    Whisker
 from bokeh.plotting import figure, ColumnDataSource
+try:
+    from streamlit.proto.BokehChart_pb2 import BokehChart as BokehChartProto
+except ImportError:
+    BokehChartProto = None
 
+from analysis import HistogramPyramid, histogram_by_category, salary_bins
 from constants import SALARY_COLUMN, STR_N_EMPLOYEES, CURRENCY_NORM, \
     INFLATION_DATA
 from commons import add_copyright
@@ -17,11 +28,110 @@ TOOLTIPS = [
 ]
 
 
+class RenderCache:
+    """
+    LRU cache of serialized Bokeh figures (JSON of bokeh.embed.json_item),
+    keyed by the identity of the loaded data (loader.YearStore.data_id) and
+    the inputs of a view. Shared by all sessions
+
+    :param max_size: Maximum number of figures
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._figures: OrderedDict = OrderedDict()
+        self._lock = RLock()  # Streamlit sessions run on separate threads
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            if key not in self._figures:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._figures.move_to_end(key)
+            return self._figures[key]
+
+    def put(self, key: tuple, figure_json: str):
+        with self._lock:
+            self._figures[key] = figure_json
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_size:
+                self._figures.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._figures)
+
+
+RENDER_CACHE = RenderCache()
+
+
+def show_cached_chart(key: Optional[tuple], container=None) -> bool:
+    """Show a figure from RENDER_CACHE. Returns False if key is None, the
+    figure is not cached, or cached figures can't be shown with this
+    streamlit, in which case the figure should be built and shown with
+    show_chart
+
+    :param key: Key of figure in RENDER_CACHE
+    :param container: Streamlit container to show in. Default: main page
+    """
+
+    if key is None or not _can_enqueue(container):
+        return False
+
+    figure_json = RENDER_CACHE.get(key)
+    if figure_json is None:
+        return False
+
+    _enqueue_chart(figure_json, container)
+    return True
+
+
+def show_chart(s: figure, key: Optional[tuple] = None, container=None):
+    """Show a Bokeh figure as st.bokeh_chart, and add to RENDER_CACHE if
+    key is provided
+
+    :param s: Bokeh figure
+    :param key: Key of figure in RENDER_CACHE. Not cached if None
+    :param container: Streamlit container to show in. Default: main page
+    """
+
+    if not _can_enqueue(container):
+        (container or st).bokeh_chart(s, use_container_width=True)
+        return
+
+    figure_json = json.dumps(json_item(s))
+    if key is not None:
+        RENDER_CACHE.put(key, figure_json)
+    _enqueue_chart(figure_json, container)
+
+
+def _can_enqueue(container=None) -> bool:
+    # An already serialized figure is shown with the private
+    # DeltaGenerator._enqueue and BokehChart proto of streamlit. If either is
+    # missing in another streamlit version, use the public st.bokeh_chart
+    if BokehChartProto is None:
+        return False
+    dg = container if container is not None else getattr(st, '_main', None)
+    return callable(getattr(dg, '_enqueue', None))
+
+
+def _enqueue_chart(figure_json: str, container=None):
+    # As st.bokeh_chart, with a figure that is already serialized
+    proto = BokehChartProto()
+    proto.figure = figure_json
+    proto.use_container_width = True
+    dg = container if container is not None else st._main
+    dg._enqueue('bokeh_chart', proto)
+
+
 def bokeh_fig_init(x_range: list, title: str = '', x_label: str = '',
                    y_label: str = '', bc: str = "#f0f0f0", bfc: str = "#fafafa",
                    tools: str = "xpan,xwheel_zoom,xzoom_in,xzoom_out,save,reset",
                    active_scroll: str = 'xwheel_zoom',
-                   tooltips: list = None) -> figure:
+                   tooltips: list = None,
+                   output_backend: str = 'canvas') -> figure:
 
     arg_keys = dict(locals())
     arg_keys['x_axis_label'] = arg_keys.pop('x_label')
@@ -51,23 +161,26 @@ def bokeh_scatter(x, y, name: pd.Series = None, x_err=None,
                                x_range=x_range, bc=bc, bfc=bfc,
                                plot_constants=True)
 
+    x = _source_array(x)
+    y = _source_array(y)
+
     if x_err is not None:
-        bin_range = ColumnDataSource(data=dict(base=y, lower=x_err[0],
-                                               upper=x_err[1]))
+        bin_range = ColumnDataSource(data=dict(base=y,
+                                               lower=_source_array(x_err[0]),
+                                               upper=_source_array(x_err[1])))
         w = Whisker(source=bin_range, base='base', lower='lower', upper='upper',
                     dimension='width', line_color=fc)
         w.upper_head.line_color = fc
         w.lower_head.line_color = fc
         s.add_layout(w)
 
+    data = dict(x=x, y=y)
     if name is not None:
-        source = ColumnDataSource(data=dict(x=x, y=y, name=name))
+        data['name'] = [str(a) for a in name]
+    source = ColumnDataSource(data=data)
 
-        s.scatter('x', 'y', marker='circle', fill_color=fc, source=source,
-                  line_color=ec, alpha=alpha, size=size, legend_label=label)
-    else:
-        s.scatter('x', 'y', marker='circle', fill_color=fc,
-                  line_color=ec, alpha=alpha, size=size, legend_label=label)
+    s.scatter('x', 'y', marker='circle', fill_color=fc, source=source,
+              line_color=ec, alpha=alpha, size=size, legend_label=label)
 
     return s
 
@@ -75,7 +188,8 @@ def bokeh_scatter(x, y, name: pd.Series = None, x_err=None,
 def bokeh_scatter_init(pay_norm: int, x_label: str, y_label: str,
                        title: str = '', x_range: list = None,
                        bc: str = "#f0f0f0", bfc: str = "#fafafa",
-                       plot_constants: bool = False) -> figure:
+                       plot_constants: bool = False,
+                       output_backend: str = 'canvas') -> figure:
 
     x_buffer = 1000 / pay_norm
     x_min = 10000 / pay_norm
@@ -94,7 +208,8 @@ def bokeh_scatter_init(pay_norm: int, x_label: str, y_label: str,
     s = bokeh_fig_init(x_range=x_range, title=title, x_label=x_label,
                        y_label=y_label, bc=bc, bfc=bfc,
                        tools="pan,wheel_zoom,box_zoom,hover,save,reset",
-                       active_scroll='wheel_zoom', tooltips=TOOLTIPS)
+                       active_scroll='wheel_zoom', tooltips=TOOLTIPS,
+                       output_backend=output_backend)
 
     constants_level = [2500, 5000, 10000, 15000, 20000]
 
@@ -112,9 +227,38 @@ def bokeh_scatter_init(pay_norm: int, x_label: str, y_label: str,
     return s
 
 
+def scatter_subsample(x: np.ndarray, x_range: list, max_points: int,
+                      seed: int = 0) -> Tuple[np.ndarray, int]:
+    """
+    Select points in x_range for a scatter plot. If there are more than
+    max_points, a uniform random subsample is selected, which preserves the
+    density of points. The subsample is the same for each rerun
+
+    :param x: Data of x-axis
+    :param x_range: Lower and upper limits of x
+    :param max_points: Maximum number of points
+    :param seed: Random seed of subsample
+
+    :return: Sorted positions of selected points, and number in x_range
+    """
+
+    x = np.asarray(x, dtype='float64')
+    in_range = np.flatnonzero((x >= x_range[0]) & (x <= x_range[1]))
+    if len(in_range) <= max_points:
+        return in_range, len(in_range)
+
+    rng = np.random.default_rng(seed)
+    shown = np.sort(rng.choice(in_range, max_points, replace=False))
+    return shown, len(in_range)
+
+
 def bokeh_histogram(x, y, pay_norm, x_label: str, y_label: str,
                     x_range: list, title: str = '',
-                    bc: str = "#f0f0f0", bfc: str = "#fafafa"):
+                    bc: str = "#f0f0f0", bfc: str = "#fafafa",
+                    render_key: Optional[tuple] = None):
+
+    if show_cached_chart(render_key):
+        return
 
     bin_size = x[1] - x[0]
 
@@ -125,13 +269,14 @@ def bokeh_histogram(x, y, pay_norm, x_label: str, y_label: str,
     l1 = add_copyright()
     s.add_layout(l1)
 
-    s.vbar(x=x, top=y, width=0.95*bin_size, fill_color="#f8b739",
+    s.vbar(x=_source_array(x), top=_source_array(y, dtype='int32'),
+           width=0.95*bin_size, fill_color="#f8b739",
            fill_alpha=0.5, line_color=None)
     if CURRENCY_NORM and pay_norm == 1:
         s.xaxis[0].formatter = PrintfTickFormatter(format="$%ik")
     else:
         s.xaxis[0].formatter = PrintfTickFormatter(format="$%i")
-    st.bokeh_chart(s, use_container_width=True)
+    show_chart(s, render_key)
 
 
 def altair_histogram(x, y, pay_norm, x_label: str, y_label: str,
@@ -154,13 +299,10 @@ def altair_histogram(x, y, pay_norm, x_label: str, y_label: str,
 def bin_data(bin_size: int, pay_norm: int, min_val: float = 10000,
              max_val: float = 2.5e6):
 
-    bins = np.arange(min_val/pay_norm, max_val/pay_norm, bin_size)
-    if CURRENCY_NORM and pay_norm == 1:
-        bins /= 1e3
-    return bins
+    return salary_bins(bin_size, pay_norm, min_val=min_val, max_val=max_val)
 
 
-def bin_data_adaptive(data: list, index: np.ndarray,
+def bin_data_adaptive(data: list, index: Union[np.ndarray, list],
                       bin_size: float, pay_norm: int,
                       min_val: float = 10000, max_val: float = 2.5e6,
                       N_min: int = 25):
@@ -168,14 +310,15 @@ def bin_data_adaptive(data: list, index: np.ndarray,
     Perform adaptive binning
 
     :param data: Data to bin
-    :param index: Index for smallest sample selection
+    :param index: Index for smallest sample selection, or a list of
+           indices (or boolean masks) to bin several selections together
     :param bin_size: Minimum bin size
     :param pay_norm: Normalization to hours
     :param min_val: Minimum bin value
     :param max_val: Maximum bin value
     :param N_min: Minimum N in each bin
 
-    :return:
+    :return: Bin edges, or a list of bin edges for a list of selections
     """
 
     arg_keys = dict(locals())
@@ -183,35 +326,74 @@ def bin_data_adaptive(data: list, index: np.ndarray,
         arg_keys.pop(unused)
     bins = bin_data(**arg_keys)
 
-    N_bin, salary_bin = np.histogram(np.array(data)[index], bins)
+    index_list = index if isinstance(index, list) else [index]
+
+    # Counts of all selections with a single bincount
+    data = np.asarray(data, dtype='float64')
+    selection_list = [data[np.asarray(t_index)] for t_index in index_list]
+    category = np.repeat(np.arange(len(index_list)),
+                         [len(t_data) for t_data in selection_list])
+    N_bin = histogram_by_category(np.concatenate(selection_list), bins,
+                                  category, len(index_list))
+
+    salary_bin_list = [bins[merge_sparse_bins(t_N_bin, N_min)]
+                       for t_N_bin in N_bin]
 
-    drops = []
-    bad = np.where(N_bin < N_min)[0]
-    for b in bad:
-        if b not in drops and b != len(N_bin)-1:
-            a = 0
-            while True:
-                drops.append(b + a + 1)
-                N_bin[b] += N_bin[b+a+1]
-                if N_bin[b] >= N_min or b+a+1 == len(N_bin)-1:
-                    break
-                else:
-                    a += 1
+    return salary_bin_list if isinstance(index, list) else salary_bin_list[0]
 
-    salary_bin = np.delete(salary_bin, drops)
 
-    return salary_bin
+def merge_sparse_bins(N_bin: np.ndarray, N_min: int) -> np.ndarray:
+    """
+    Merge each bin with fewer than N_min into the following bins until
+    there are at least N_min, or the last bin is reached
+
+    :param N_bin: Number in each bin
+    :param N_min: Minimum N in each bin
+
+    :return: Boolean mask of bin edges to keep
+    """
+
+    n_bins = len(N_bin)
+    keep = np.ones(n_bins + 1, dtype=bool)
 
+    # Last bin of a merge starting at each bin, from cumulative counts
+    cumulative = np.concatenate([[0], np.cumsum(N_bin)])
+    merge_end = np.searchsorted(cumulative, cumulative[:-1] + N_min,
+                                side='left') - 1
+    merge_end = np.minimum(merge_end, n_bins - 1)
 
-def histogram_plot(data, bin_size, pay_norm: int, bokeh=True):
+    # Sparse bins that start a merge, unless merged into a previous bin
+    sparse = np.flatnonzero(N_bin[:-1] < N_min)
+    b = 0
+    while b < len(sparse):
+        end = merge_end[sparse[b]]
+        keep[sparse[b] + 1:end + 1] = False
+        b = np.searchsorted(sparse, end, side='right')
 
-    bins = bin_data(bin_size, pay_norm)
+    return keep
+
+
+def histogram_plot(data, bin_size, pay_norm: int, bokeh=True,
+                   histograms: Optional[HistogramPyramid] = None,
+                   column: str = '', keys: Optional[list] = None,
+                   render_key: Optional[tuple] = None):
+    """
+    Plot histogram of salary
+
+    :param data: DataFrame for viewing. Not used if histograms is provided
+    :param bin_size: Bin size
+    :param pay_norm: Normalization to hours
+    :param bokeh: Boolean to use Bokeh. Default: True
+    :param histograms: Cumulative numbers of the fiscal year of data
+    :param column: Column of keys for histograms. All of campus if empty
+    :param keys: Groups of column for histograms
+    :param render_key: Key of Bokeh figure in RENDER_CACHE. Not cached if
+           not provided
+    """
 
     x_buffer = 1000 / pay_norm
     x_limit = 500000 / pay_norm
-    sal_data = (data[SALARY_COLUMN] / pay_norm).copy()
     if CURRENCY_NORM and pay_norm == 1:
-        sal_data /= 1e3
         x_buffer /= 1e3
         x_limit /= 1e3
 
@@ -220,9 +402,21 @@ def histogram_plot(data, bin_size, pay_norm: int, bokeh=True):
     else:
         x_label = 'Hourly Rate'
 
-    N_bin, salary_bin = np.histogram(sal_data, bins=bins)
+    if histograms is not None:
+        N_bin, salary_bin, max_salary = \
+            histograms.histogram(bin_size, column=column, keys=keys)
+        bins = salary_bin
+    else:
+        bins = bin_data(bin_size, pay_norm)
+        sal_data = (data[SALARY_COLUMN] / pay_norm).copy()
+        if CURRENCY_NORM and pay_norm == 1:
+            sal_data /= 1e3
+        N_bin = histogram_by_category(sal_data, bins)[0]
+        salary_bin = bins
+        max_salary = max(sal_data)
+
     x_range = [min(bins) - x_buffer,
-               min([max(sal_data) + x_buffer, x_limit])]
+               min([max_salary + x_buffer, x_limit])]
     if not bokeh:
         altair_histogram(salary_bin[:-1], N_bin, pay_norm,
                          x_label=x_label, y_label=STR_N_EMPLOYEES,
@@ -230,13 +424,76 @@ def histogram_plot(data, bin_size, pay_norm: int, bokeh=True):
     else:
         bokeh_histogram(salary_bin[:-1], N_bin, pay_norm,
                         x_label=x_label, y_label=STR_N_EMPLOYEES,
-                        x_range=x_range)
+                        x_range=x_range, render_key=render_key)
+
+
+def wage_growth_figure(salary, percent, name, is_changed: np.ndarray,
+                       shown: np.ndarray, average_df_list: list,
+                       bin_edges: np.ndarray, trends_type: str, pay_norm: int,
+                       salary_range: list) -> figure:
+    """
+    Scatter plot of Wage Growth page: salary change of shown employees and
+    averages in salary bins for All, Unchanged and Changed titles
+
+    :param salary: Salary of employees
+    :param percent: Percentage change in salary of employees
+    :param name: Name of employees
+    :param is_changed: Boolean array, True if title changed
+    :param shown: Positions of employees to show (see scatter_subsample)
+    :param average_df_list: DataFrames of All, Unchanged and Changed from
+           analysis.compute_bin_averages
+    :param bin_edges: Salary bin edges of averages
+    :param trends_type: 'Median' or 'Average'
+    :param pay_norm: Normalization to hours
+    :param salary_range: Salary range of x-axis
+    """
+
+    y_type = 'median %' if trends_type == 'Median' else 'mean %'
+    salary = np.asarray(salary, dtype='float64')
+    percent = np.asarray(percent, dtype='float64')
+    name = np.asarray(name)
+
+    s = bokeh_scatter_init(pay_norm, x_label=SALARY_COLUMN,
+                           y_label='Percentage', x_range=salary_range,
+                           plot_constants=True, output_backend='webgl')
+    s.y_range = Range1d(-10, 25)
+
+    shown_same = shown[~is_changed[shown]]
+    shown_changed = shown[is_changed[shown]]
+
+    # Unchanged set
+    s = bokeh_scatter(salary[shown_same], percent[shown_same],
+                      name=name[shown_same], fc='white', label='Unchanged',
+                      s=s)
+
+    # Changed set
+    s = bokeh_scatter(salary[shown_changed], percent[shown_changed],
+                      name=name[shown_changed], fc='white', ec='purple',
+                      label='Changed', s=s)
+
+    # Plot averages of All, Unchanged and Changed on top
+    style_list = [
+        dict(fc='black', ec='black', label=f'All ({trends_type})'),
+        dict(ec='black', label=f'Unchanged ({trends_type})'),
+        dict(fc='purple', ec='black', label=f'Changed ({trends_type})'),
+    ]
+    for average_df, style in zip(average_df_list, style_list):
+        s = bokeh_scatter(average_df['bin'], average_df[y_type],
+                          name=average_df['Salary range'],
+                          x_err=[bin_edges[:-1], bin_edges[1:]],
+                          size=10, alpha=0.6, s=s, **style)
+
+    return s
 
 
 def percentile_plot(data, bin_size, fy_select: str,
                     same_title: np.ndarray = None,
                     title_changed: np.ndarray = None,
-                    bc: str = "#f0f0f0", bfc: str = "#fafafa"):
+                    bc: str = "#f0f0f0", bfc: str = "#fafafa",
+                    render_key: Optional[tuple] = None):
+
+    if show_cached_chart(render_key):
+        return
 
     def _percent_norm(x):
         return x/len(data) * 100
@@ -253,11 +510,20 @@ def percentile_plot(data, bin_size, fy_select: str,
                        y_label='Percentage of Total Employees', bc=bc, bfc=bfc,
                        tools="xpan,xwheel_zoom,xzoom_in,xzoom_out,save,reset")
 
-    N_bin, percent_bin = np.histogram(data, bins=bins)
+    # Unchanged (0), Changed (1) and others (2) are binned together
+    category = np.full(len(data), 2)
+    if same_title is not None:
+        category[same_title] = 0
+    if title_changed is not None:
+        category[title_changed] = 1
+    N_bin_category = histogram_by_category(data, bins, category, 3)
+    N_bin = N_bin_category.sum(axis=0)
+    percent_bin = bins
 
     fy_inflation = INFLATION_DATA[fy_select]
     y_inflation = [0, max(_percent_norm(N_bin)+5)]
-    s.line([fy_inflation] * 2, y_inflation, color='red', width=2)
+    s.line(_source_array([fy_inflation] * 2), _source_array(y_inflation),
+           color='red', width=2)
 
     l1 = Label(x=INFLATION_DATA[fy_select], y=y_inflation[1],
                x_offset=15, y_offset=-5, x_units='data', y_units='data',
@@ -272,16 +538,12 @@ def percentile_plot(data, bin_size, fy_select: str,
            legend_label='All')
 
     if same_title is not None:
-        N_bin1, percent_bin1 = np.histogram(data[same_title], bins=bins)
-
-        s.vbar(x=percent_bin1[:-1], top=_percent_norm(N_bin1),
+        s.vbar(x=percent_bin[:-1], top=_percent_norm(N_bin_category[0]),
                width=1.0 * bin_size, fill_color="#f8b739", fill_alpha=0.5,
                line_color=None, legend_label='Unchanged')
 
     if title_changed is not None:
-        N_bin2, percent_bin2 = np.histogram(data[title_changed], bins=bins)
-
-        s.vbar(x=percent_bin2[:-1], top=_percent_norm(N_bin2),
+        s.vbar(x=percent_bin[:-1], top=_percent_norm(N_bin_category[1]),
                width=1.0 * bin_size, fill_color="purple", fill_alpha=0.5,
                line_color=None, legend_label='Changed')
 
@@ -290,7 +552,7 @@ def percentile_plot(data, bin_size, fy_select: str,
 
     s.yaxis[0].formatter = PrintfTickFormatter(format="%i%%")
 
-    st.bokeh_chart(s, use_container_width=True)
+    show_chart(s, render_key)
 
 
 def draw_constant_salary_bump(s: figure, constant_list: list, pay_norm: int):
@@ -299,16 +561,44 @@ def draw_constant_salary_bump(s: figure, constant_list: list, pay_norm: int):
 
     """
 
+    line_data, label_data = \
+        constant_salary_bump_data(tuple(constant_list), pay_norm,
+                                  s.x_range.start, CURRENCY_NORM)
+
+    s.multi_line('xs', 'ys', line_dash='dashed', line_color='black',
+                 source=ColumnDataSource(data=line_data))
+
+    labels = LabelSet(x='x', y='y', text='text',
+                      source=ColumnDataSource(data=label_data))
+    s.add_layout(labels)
+
+    return s
+
+
+@lru_cache(maxsize=32)
+def constant_salary_bump_data(constant_list: tuple, pay_norm: int,
+                              x_start: float, currency_norm: bool) -> \
+        Tuple[dict, dict]:
+    """
+    Lines and labels for constant salary increase, computed once for each
+    pay_norm, currency normalization and start of x-axis
+
+    :return: Data of lines (xs, ys, name) for multi_line, and data of
+             labels (x, y, text) for LabelSet
+    """
+
     constant_list0 = [c / pay_norm for c in constant_list]
-    if CURRENCY_NORM and pay_norm == 1:
+    if currency_norm and pay_norm == 1:
         constant_list0 = [a / 1e3 for a in constant_list]
         x_max = 2500.
 
     if pay_norm > 1:
         x_max = 1200.
 
+    line_data = {'xs': [], 'ys': [], 'name': []}
+    label_data = {'x': [], 'y': [], 'text': []}
     for c, constant in enumerate(constant_list0):
-        x = np.arange(max([s.x_range.start, constant + 1]), x_max, 5)
+        x = np.arange(max([x_start, constant + 1]), x_max, 5)
         y = 100 * constant/(x-constant)
 
         if pay_norm == 1:
@@ -316,15 +606,22 @@ def draw_constant_salary_bump(s: figure, constant_list: list, pay_norm: int):
         else:
             text = f'${constant_list[c]/1e3}k (${constant:.2f}/hr)'
 
-        source = ColumnDataSource(data=dict(x=x, y=y, name=[text] * len(x)))
-
-        s.line('x', 'y', line_dash='dashed', line_color='black',
-               source=source)
+        line_data['xs'].append(x)
+        line_data['ys'].append(y)
+        line_data['name'].append(text)
 
         y_label = constant_list[c]/1e3
-        x_label = constant + 100 * constant / y_label
+        label_data['x'].append(constant + 100 * constant / y_label)
+        label_data['y'].append(y_label)
+        label_data['text'].append(text)
 
-        label = Label(x=x_label, y=y_label, text=text)
-        s.add_layout(label)
+    label_data['x'] = _source_array(label_data['x'])
+    label_data['y'] = _source_array(label_data['y'])
 
-    return s
+    return line_data, label_data
+
+
+def _source_array(values, dtype: str = 'float64') -> np.ndarray:
+    # Contiguous float64/int32 arrays are serialized by Bokeh as binary
+    # (base64), instead of a JSON list. int64 is not supported in binary
+    return np.ascontiguousarray(values, dtype=dtype)
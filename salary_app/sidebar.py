@@ -1,9 +1,10 @@
 import re
 
+import pandas as pd
 import streamlit as st
 
 from constants import DATA_VIEWS, FY_LIST, PAY_CONVERSION, FISCAL_HOURS, \
-    TRENDS_LIST, SALARY_COLUMN, COLLEGE_NAME, TITLE_LIST
+    TRENDS_LIST, TITLE_LIST, CURRENCY_NORM
 
 
 def select_data_view() -> str:
@@ -56,24 +57,23 @@ def select_trends() -> str:
     return trends_select
 
 
-def select_minimum_salary(df, step, college_select: str = ''):
-    """Sidebar widget to select minimum salary for Highest Earners page"""
+def select_minimum_salary(max_salary: float, step, college_select: str = ''):
+    """Sidebar widget to select minimum salary for Highest Earners page
+
+    :param max_salary: Maximum salary of campus, or college_select
+    """
 
     st.sidebar.markdown('### Enter minimum FTE salary:')
-    sal_describe = df[SALARY_COLUMN].describe()
 
     number_input_settings = {
         'min_value': 100000,
-        'max_value': int(sal_describe['max']),
+        'max_value': int(max_salary),
         'value': 500000,
         'step': step
     }
 
     if college_select:
-        t_df = df.loc[df[COLLEGE_NAME] == college_select]
-        sal_describe = t_df[SALARY_COLUMN].describe()
-        max_value = int(sal_describe['max'])
-        number_input_settings['max_value'] = max_value
+        max_value = int(max_salary)
 
         if max_value > 100000:
             number_input_settings['min_value'] = 75000
@@ -104,6 +104,32 @@ def select_bin_size(pay_norm: int, index: int = 2,
     return bin_size
 
 
+def select_salary_range(pay_norm: int, max_value: float) -> list:
+    """Sidebar widget to select salary range of Wage Growth scatter plot.
+    Default is the range of the full plot"""
+
+    x_buffer = 1000 / pay_norm
+    x_min = 10000 / pay_norm
+    x_limit = 500000 / pay_norm
+    if CURRENCY_NORM and pay_norm == 1:
+        x_buffer /= 1e3
+        x_min /= 1e3
+        x_limit /= 1e3
+
+    value = (x_min - x_buffer, x_limit + x_buffer)
+    # Salaries may all be missing, giving a NaN maximum
+    if pd.notna(max_value):
+        max_value = max(float(max_value), value[1])
+    else:
+        max_value = value[1]
+
+    st.sidebar.markdown('### Select salary range of employees to show:')
+    salary_range = st.sidebar.slider('', min_value=0.0, max_value=max_value,
+                                     value=value)
+
+    return list(salary_range)
+
+
 def select_search_method():
     """Sidebar widget to identify search method for individual search page"""
     st.sidebar.markdown('### Search method:')
@@ -1,17 +1,18 @@
-from time import sleep
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
 import streamlit as st
-from bokeh.models import Range1d
 
 import sidebar
-from constants import FISCAL_HOURS, SALARY_COLUMN, COLLEGE_NAME, \
-    INDIVIDUAL_COLUMNS, FY_LIST, CURRENCY_NORM, INFLATION_DATA
-from plots import histogram_plot, bokeh_scatter, bokeh_scatter_init, \
-    percentile_plot, bin_data_adaptive
+from constants import SALARY_COLUMN, COLLEGE_NAME, \
+    INDIVIDUAL_COLUMNS, FY_LIST, CURRENCY_NORM, LOD_MAX_POINTS, \
+    NAME_SEARCH_LIMIT
+from plots import histogram_plot, percentile_plot, bin_data_adaptive, \
+    scatter_subsample, show_cached_chart, show_chart, wage_growth_figure
 from commons import get_summary_data, format_salary_df, show_percentile_data
-from analysis import compute_bin_averages
+from analysis import GroupIndex, HistogramPyramid, NameIndex, build_panel, \
+    compute_bin_averages, compute_trends, individual_growth, COMMON_FIELDS
 
 
 def about_page():
@@ -104,21 +105,19 @@ def about_page():
     """, unsafe_allow_html=True)
 
 
-def trends_page(data_dict: dict, pay_norm: int = 1):
-    """Load Trends page
+@st.cache(hash_funcs={'loader.YearStore': lambda store: store.data_id})
+def get_trends_tables(data_dict: dict, pay_norm: int = 1) -> \
+        Tuple[pd.DataFrame, pd.DataFrame]:
+    """Get General and Income Bracket tables for Trends page. These are
+    cached for each data_dict (by YearStore.data_id) and pay_norm
 
-    :param data_dict: Dictionary containing DataFrame for each FY
+    :param data_dict: Mapping (dict or YearStore) of DataFrame for each FY
     :param pay_norm: Flag indicate type of normalization.
            Annual = 1, Otherwise, it's number of working hours based on FY
     """
 
-    def _right_align(s, props='text-align: right;'):
-        return props
-
     str_pay_norm = "hourly rate" if pay_norm != 1 else "FTE salary"
 
-    trends_select = sidebar.select_trends()
-
     stats_list = [
         'No. of employees',
         'Full-time equivalents',
@@ -142,21 +141,20 @@ def trends_page(data_dict: dict, pay_norm: int = 1):
     bracket_list = [f'No. empl. {dir} ${ib:,d}/{norm}' for
                     ib, dir in zip(income_brackets, income_direction)]
 
-    table_columns = list(data_dict.keys().__reversed__())
+    stats_df, n_bracket_df = compute_trends(data_dict, pay_norm,
+                                            income_brackets, n_below=2)
+
+    table_columns = stats_df.index.tolist()
     trends_df = pd.DataFrame(columns=table_columns)
     bracket_df = pd.DataFrame(columns=table_columns)
 
     last_year_value = []
     for i, fy in enumerate(table_columns):
-        df = data_dict[fy]
-        fy_norm = 1 if pay_norm == 1 else FISCAL_HOURS[fy]
-
-        s_col = df[SALARY_COLUMN] / fy_norm
+        t_stats = stats_df.loc[fy]
         value_list = [
-            df.shape[0], df['FTE'].sum(), df.loc[df['FTE'] < 1].shape[0],
-            int(df['Annual Salary at Employment FTE'].sum())/fy_norm,
-            int((df['Annual Salary at Employment FTE'] * df['State Fund Ratio']).sum()) / fy_norm,
-            s_col.mean(), s_col.median(), s_col.min(), s_col.max(),
+            int(t_stats['size']), t_stats['FTE'], int(t_stats['part_time']),
+            t_stats['budget'], t_stats['state_budget'],
+            t_stats['mean'], t_stats['median'], t_stats['min'], t_stats['max'],
         ]
 
         if i == 0:
@@ -182,9 +180,7 @@ def trends_page(data_dict: dict, pay_norm: int = 1):
             str_list[4] = str_list[4].split(' ')[0] + ' ( N/A )'
         trends_df[fy] = str_list
 
-        value_list2 = \
-            [len(s_col.loc[s_col <= ib]) for ib in income_brackets[0:2]] + \
-            [len(s_col.loc[s_col >= ib]) for ib in income_brackets[2:]]
+        value_list2 = n_bracket_df.loc[fy].tolist()
 
         percent_list2 = [v/value_list[0] * 100 for v in value_list2]
 
@@ -202,6 +198,24 @@ def trends_page(data_dict: dict, pay_norm: int = 1):
     trends_df.index = stats_list
     bracket_df.index = bracket_list
 
+    return trends_df, bracket_df
+
+
+def trends_page(data_dict: dict, pay_norm: int = 1):
+    """Load Trends page
+
+    :param data_dict: Mapping (dict or YearStore) of DataFrame for each FY
+    :param pay_norm: Flag indicate type of normalization.
+           Annual = 1, Otherwise, it's number of working hours based on FY
+    """
+
+    def _right_align(s, props='text-align: right;'):
+        return props
+
+    trends_select = sidebar.select_trends()
+
+    trends_df, bracket_df = get_trends_tables(data_dict, pay_norm)
+
     if 'General' in trends_select:
         st.write('## General Statistical Trends')
         st.dataframe(trends_df.style.applymap(_right_align))
@@ -216,11 +230,17 @@ def trends_page(data_dict: dict, pay_norm: int = 1):
         st.write("Percentages are relative to total number of employees for a given year.")
 
 
-def individual_search_page(data_dict: dict, unique_df: pd.DataFrame):
+def individual_search_page(data_dict: dict, unique_df: pd.DataFrame,
+                           panel: Optional[pd.DataFrame] = None,
+                           name_index: Optional[NameIndex] = None):
     """Search tool page for individuals and by department
 
     :param data_dict: Dictionary containing DataFrame for each FY
     :param unique_df: DataFrame with unique names
+    :param panel: Panel of all FY from analysis.build_panel. Built from
+           data_dict if not provided
+    :param name_index: Search index of names of unique_df. Built from
+           unique_df and panel if not provided
     """
 
     st.write("""
@@ -232,21 +252,39 @@ def individual_search_page(data_dict: dict, unique_df: pd.DataFrame):
 
     Search tips:
     
-    1. For individual search, enter the full name as "LastName,FirstName"
+    1. For individual search, enter the name as "LastName,FirstName" or
+       the start of it. Department and title words narrow the search.
+       Separate searches for multiple individuals with ";"
     2. For department search, enter its acronym or part of the department's name
     """)
 
-    list_names = unique_df['Name']
-
     search_method = sidebar.select_search_method()
 
+    if panel is None:
+        panel = build_panel(data_dict)
+
     # Initialize
     names_select = []
     sort_alpha = False
 
     if search_method == 'Individual':
-        st.markdown("Select/enter names of individuals:")
-        names_select = st.multiselect('', list_names)
+        if name_index is None:
+            name_index = NameIndex(unique_df, panel=panel)
+
+        st.markdown("Search names of individuals:")
+        query = st.text_input('', '')
+
+        # Only the best matches of each search are sent to the browser
+        names_found = []
+        for name_query in query.split(';'):
+            for name in name_index.search(name_query, NAME_SEARCH_LIMIT):
+                if name not in names_found:
+                    names_found.append(name)
+        if query.strip() and not names_found:
+            st.info("No names found!")
+
+        st.markdown("Select names of individuals:")
+        names_select = st.multiselect('', names_found)
 
         sort_alpha = \
             st.checkbox(f'Sort results alphabetically by last name', True)
@@ -276,110 +314,114 @@ def individual_search_page(data_dict: dict, unique_df: pd.DataFrame):
         describe_df = dept_match_df[SALARY_COLUMN].describe()
         show_percentile_data([describe_df], no_count=True)
 
-        progress_bar = st.progress(0)
-        sleep(0.5)
-
     if sort_alpha:
         names_select.sort()
 
-    for i, name in enumerate(names_select, 1):
-        st.write(f"**Records for: {name}**")
+    # uid of department search are of the most recent fiscal year, which
+    # includes names matched to a person with a different name format
+    if search_method == 'Department':
+        uid_index = dept_match_df.set_index('Name')['uid']
+    else:
+        uid_index = unique_df.set_index('Name')['uid']
+    uid_select = uid_index.reindex(names_select).dropna().astype('int64')
 
-        uid_df = unique_df.loc[unique_df['Name'].isin([name])]
-        uid = uid_df['uid'].values[0]
+    # Records and growth of all individuals are computed together
+    records_df, growth_df = individual_growth(panel, uid_select.tolist())
 
-        in_fy_list = uid_df['year'].values[0].split(';')
+    for name in names_select:
+        st.write(f"**Records for: {name}**")
 
-        record_df = pd.DataFrame()  # index=in_fy_list)
-        for fy in in_fy_list:
-            t_df = data_dict[fy]
-            record = t_df.loc[t_df['uid'] == uid]
-            record_df = record_df.append(record)
-        record_df.index = in_fy_list
+        uid = uid_select.get(name)
+        if uid is None or uid not in growth_df.index:
+            st.info("No records found! The name is not unique in any fiscal year")
+            continue
+
+        # Records are sorted by fiscal year with year-to-year change
+        record_df = records_df.loc[uid].rename_axis(None)
+        growth = growth_df.loc[uid]
 
         select_individual_columns = INDIVIDUAL_COLUMNS.copy()
 
         # Add year-to-year change
-        if len(record_df) > 1:
-            salary_arr = record_df[SALARY_COLUMN].values
-            percent = [np.nan]
-            percent += list((salary_arr[1:] / salary_arr[0:-1] - 1.0) * 100.)
-            record_df.insert(len(record_df.columns), '%', percent)
-
+        if growth['N'] > 1:
             # If common data across year, show above table
-            for common_field in ['Primary Title', 'Department', COLLEGE_NAME]:
-                cf_values = record_df.loc[
-                    record_df[common_field].notnull(), common_field].unique()
-                if len(cf_values) == 1:
-                    st.write(f"{common_field}: {cf_values[0]}")
+            for common_field in COMMON_FIELDS:
+                if pd.notnull(growth[common_field]):
+                    st.write(f"{common_field}: {growth[common_field]}")
                     select_individual_columns.remove(common_field)
 
-            # Get and overlay average
-            n_years = float(in_fy_list[-1].split('-')[0].replace('FY', '')) - \
-                float(in_fy_list[0].split('-')[0].replace('FY', ''))
-            avg_y2y = 100 * (salary_arr[-1] - salary_arr[0])/salary_arr[0] / n_years
-
-            # Get average inflation data
-            inflation_list = [INFLATION_DATA[key] for key in in_fy_list[1:]]
-            cumul_inflation = 1
-            for infl in inflation_list:
-                cumul_inflation *= 1 + infl / 100
-            avg_inflation = (cumul_inflation-1)/n_years * 100
-
+            avg_y2y = growth['avg_y2y']
+            avg_inflation = growth['avg_inflation']
             st.write(f"_Average year-to-year growth_: {avg_y2y:.2f}% "
                      f"({avg_y2y/avg_inflation:.2f}x inflation)")
 
             st.write(f"_Average year-to-year CPI inflation_: "
                      f"{avg_inflation:.2f}%")
-            record_df.insert(len(record_df.columns), 'CPI %', [np.nan] + inflation_list)
         else:
             select_individual_columns.remove('%')
             select_individual_columns.remove('CPI %')
 
         # Only show columns with non-unique results across year
         format_salary_df(record_df[select_individual_columns])
-        if search_method == 'Department':
-            progress_bar.progress(i/len(names_select))
 
 
 def salary_summary_page(df: pd.DataFrame, pay_norm: int,
-                        bokeh: bool = True):
+                        bokeh: bool = True,
+                        summary_df: Optional[pd.DataFrame] = None,
+                        group_index: Optional[GroupIndex] = None,
+                        histograms: Optional[HistogramPyramid] = None,
+                        fy_select: str = '', data_id: str = ''):
     """
     Load Salary Summary page
 
     :param df: DataFrame for viewing
     :param pay_norm: Normalization constant for hourly/annual
     :param bokeh: Boolean to use Bokeh. Default: True
+    :param summary_df: Precomputed statistics (see loader.read_summary)
+    :param group_index: Group index of df. Built if not provided
+    :param histograms: Cumulative numbers of salaries of df for histograms.
+           Histograms are computed from df if not provided
+    :param fy_select: Fiscal year of df
+    :param data_id: Identity of the loaded data (see loader.YearStore).
+           Figures are cached if provided with fy_select
     """
 
     bin_size = sidebar.select_bin_size(pay_norm)
 
+    if group_index is None:
+        group_index = GroupIndex(df)
+
     # Plot summary data by college locations
     # Fix handling for different college locations, including null case
-    location = df['College Location'].dropna().unique()
-    pd_loc_dict = {
-        'College Location': {
-            loc: df['College Location'] == loc for loc in location
-        }
-    }
+    location = group_index.locations
+    pd_loc_dict = {'College Location': list(location)}
     if len(location) > 0:
-        if not df.loc[df['College Location'].isnull()].empty:
-            pd_loc_dict['College Location']['N/A'] = \
-                df['College Location'].isnull()
+        if group_index.missing_location:
+            pd_loc_dict['College Location'].append('N/A')
 
-    get_summary_data(df, pd_loc_dict, 'summary', pay_norm)
+    get_summary_data(df, pd_loc_dict, 'summary', pay_norm,
+                     summary_df=summary_df)
 
-    histogram_plot(df, bin_size, pay_norm, bokeh=bokeh)
+    render_key = None
+    if fy_select and data_id:
+        render_key = (data_id, 'Salary Summary', fy_select, pay_norm,
+                      bin_size)
+    histogram_plot(df, bin_size, pay_norm, bokeh=bokeh, histograms=histograms,
+                   render_key=render_key)
 
 
-def highest_earners_page(df, step: int = 25000):
+def highest_earners_page(df, step: int = 25000, group_index=None):
     """
     Load Highest Earners page
 
     :param df: DataFrame for viewing
     :param step: Step-size for +/- for manual changes via clicks
+    :param group_index: Group index of df. Built if not provided
     """
 
+    if group_index is None:
+        group_index = GroupIndex(df)
+
     st.write('Choose across campus or College/Division')
     select_method = st.selectbox('', ['Entire University', 'College/Division'],
                                  index=0)
@@ -388,7 +430,7 @@ def highest_earners_page(df, step: int = 25000):
     if select_method == 'College/Division':
         step = 5000  # Change step size
 
-        college_list = sorted(df[COLLEGE_NAME].dropna().unique())
+        college_list = group_index.keys(COLLEGE_NAME)
 
         # Shows selection box for Colleges
         if len(college_list) > 0:
@@ -402,21 +444,20 @@ def highest_earners_page(df, step: int = 25000):
             the full data. Stay tuned my patient data scientist!""")
             return
 
-    min_salary = sidebar.select_minimum_salary(df, step, college_select)
+    min_salary = sidebar.select_minimum_salary(
+        group_index.max_salary(college_select), step, college_select)
 
     # Select sample
     if select_method == 'College/Division':
-        df_ref = df.loc[df[COLLEGE_NAME] == college_select]
         str_ref = college_select
     else:
-        df_ref = df.copy()
         str_ref = 'UofA'
 
-    highest_df = df_ref.loc[df[SALARY_COLUMN] >= min_salary]
+    # Presorted by descending salary
+    highest_df = df.iloc[group_index.highest(min_salary, college_select)]
 
-    percent = len(highest_df)/len(df_ref) * 100.0
-    highest_df = highest_df.sort_values(by=[SALARY_COLUMN],
-                                        ascending=False).reset_index()
+    percent = len(highest_df)/group_index.count(college_select) * 100.0
+    highest_df = highest_df.reset_index()
 
     write_str_list = [
         f'Number of {str_ref} employees making at or above ${min_salary:,.2f}: ' +
@@ -467,7 +508,9 @@ def highest_earners_page(df, step: int = 25000):
         ''')
 
 
-def subset_select_data_page(df, field_name, style, pay_norm, bokeh=True):
+def subset_select_data_page(df, field_name, style, pay_norm, bokeh=True,
+                            summary_df=None, group_index=None,
+                            histograms=None, fy_select='', data_id=''):
     """
     Show College/Division Data or Department Data page
 
@@ -478,15 +521,26 @@ def subset_select_data_page(df, field_name, style, pay_norm, bokeh=True):
            Options are summary, college, department
     :param pay_norm: Normalization constant for hourly/annual
     :param bokeh: Boolean to use Bokeh. Default: True
+    :param summary_df: Precomputed statistics (see loader.read_summary)
+    :param group_index: Group index of df. Built if not provided
+    :param histograms: Cumulative numbers of salaries of df for histograms.
+           Histograms are computed from df if not provided
+    :param fy_select: Fiscal year of df
+    :param data_id: Identity of the loaded data (see loader.YearStore).
+           Figures are cached if provided with fy_select
     """
 
     bin_size = sidebar.select_bin_size(pay_norm)
 
+    if group_index is None:
+        group_index = GroupIndex(df)
+
     dept_list = []
     in_selection = []
+    selection_keys = []
     pd_loc_dict = dict()
 
-    college_list = sorted(df[COLLEGE_NAME].dropna().unique())
+    college_list = group_index.keys(COLLEGE_NAME)
 
     # Shows selection box for Colleges
     if field_name == COLLEGE_NAME:
@@ -499,11 +553,10 @@ def subset_select_data_page(df, field_name, style, pay_norm, bokeh=True):
                     'Choose at least one College/Division', college_list)
 
             if len(college_select) > 0:
-                pd_loc_dict['College List'] = \
-                    {college: df[field_name] == college for
-                     college in college_select}
+                pd_loc_dict['College List'] = list(college_select)
 
-                in_selection = df[field_name].isin(college_select)
+                in_selection = group_index.take(field_name, college_select)
+                selection_keys = list(college_select)
         else:
             st.error("""
             Unfortunately the current available data for this fiscal year does
@@ -529,32 +582,41 @@ def subset_select_data_page(df, field_name, style, pay_norm, bokeh=True):
                 f'Choose at least one {sel_method}', college_list)
             college_select = sorted(college_select)
 
-            pd_loc_dict['College List'] = \
-                {college: df[COLLEGE_NAME] == college for
-                 college in college_select}
+            pd_loc_dict['College List'] = college_select
 
-            sel = df[COLLEGE_NAME].isin(college_select)
-            dept_list = sorted(df[field_name].loc[sel].unique())
+            dept_list = group_index.departments(college_select)
 
         # Populate dept list by college selection
         if sel_method == 'Department':
             dept_list = st.multiselect(f'Choose at least one {sel_method}',
-                                       sorted(df[field_name].unique()))
+                                       group_index.keys(field_name))
 
         if len(dept_list) > 0:
-            in_selection = df[field_name].isin(dept_list)
-            pd_loc_dict['Department List'] = \
-                {entry: df[field_name] == entry for entry in dept_list}
+            in_selection = group_index.take(field_name, dept_list)
+            selection_keys = list(dept_list)
+            pd_loc_dict['Department List'] = list(dept_list)
 
     if len(in_selection) > 0:
-        get_summary_data(df, pd_loc_dict, style, pay_norm)
-
-        coll_data = df[in_selection]
-        histogram_plot(coll_data, bin_size, pay_norm, bokeh=bokeh)
+        get_summary_data(df, pd_loc_dict, style, pay_norm,
+                         summary_df=summary_df, group_index=group_index)
+
+        render_key = None
+        if fy_select and data_id:
+            render_key = (data_id, field_name, fy_select, pay_norm, bin_size,
+                          tuple(selection_keys))
+
+        if histograms is not None:
+            histogram_plot(None, bin_size, pay_norm, bokeh=bokeh,
+                           histograms=histograms, column=field_name,
+                           keys=selection_keys, render_key=render_key)
+        else:
+            coll_data = df.iloc[in_selection]
+            histogram_plot(coll_data, bin_size, pay_norm, bokeh=bokeh,
+                           render_key=render_key)
 
 
 def wage_growth_page(data_dict: dict, fy_select: str,
-                     pay_norm, bokeh=True):
+                     pay_norm, bokeh=True, panel=None, data_id=''):
     """
     Show wage growth plots
 
@@ -562,6 +624,10 @@ def wage_growth_page(data_dict: dict, fy_select: str,
     :param fy_select:
     :param pay_norm: Normalization constant for hourly/annual
     :param bokeh: Boolean to use Bokeh. Default: True
+    :param panel: Panel of all FY from analysis.build_panel. Built from
+           data_dict if not provided
+    :param data_id: Identity of data_dict (see loader.YearStore). Figures
+           are cached if provided
     """
 
     st.write(f"""
@@ -580,33 +646,28 @@ def wage_growth_page(data_dict: dict, fy_select: str,
        (e.g., Interim Dean to Associate Professor)
     """)
 
-    # Get selected year
-    df = data_dict[fy_select]
-
-    df = df.loc[df['uid'].notnull()]
-
     # Get previous year
     list_fy = list(data_dict)
     prev_year = list_fy[list_fy.index(fy_select)+1]
-    df_old = data_dict[prev_year]
-    df_old = df_old.loc[df_old['uid'].notnull()]
 
-    result_df = df.merge(df_old, how='inner', suffixes=['_A', '_B'], on=['uid'])
+    # Get selected year for those with a record in previous year
+    if panel is None:
+        panel = build_panel(data_dict)
+    result_df = panel.xs(fy_select, level='fiscal_year')
+    result_df = result_df.loc[result_df['prev_fiscal_year'] == prev_year]
+    result_df = result_df.reset_index()
 
-    s_col = result_df[f'{SALARY_COLUMN}_A'] / pay_norm
-    percent = (result_df[f'{SALARY_COLUMN}_A'] /
-               result_df[f'{SALARY_COLUMN}_B'] - 1) * 100
+    s_col = result_df[SALARY_COLUMN] / pay_norm
+    percent = result_df['%']
     if CURRENCY_NORM and pay_norm == 1:
         s_col /= 1e3
 
     bin_size = sidebar.select_bin_size(pay_norm, index=3,
                                        markdown_text='minimum')
 
-    same_title = result_df.loc[result_df['Primary Title_A'] ==
-                               result_df['Primary Title_B']].index
+    same_title = result_df.loc[~result_df['Title Changed']].index
 
-    title_changed = result_df.loc[result_df['Primary Title_A'] !=
-                                  result_df['Primary Title_B']].index
+    title_changed = result_df.loc[result_df['Title Changed']].index
 
     n_same = len(same_title)
     n_changed = len(title_changed)
@@ -631,8 +692,9 @@ def wage_growth_page(data_dict: dict, fy_select: str,
 
     st.markdown("## Statistics by Categories")
 
+    render_key = (data_id, 'Wage Growth', fy_select) if data_id else None
     percentile_plot(percent.values, 1, fy_select, same_title=same_title,
-                    title_changed=title_changed)
+                    title_changed=title_changed, render_key=render_key)
 
     percentiles = np.arange(0.1, 1.0, 0.1)
     all_percent_df = percent.describe(percentiles=percentiles).rename('All')
@@ -654,60 +716,36 @@ def wage_growth_page(data_dict: dict, fy_select: str,
                 f"{'Annual Salary' if pay_norm == 1 else 'Hourly Wage'}")
 
     trends_type = st.selectbox('Show median/average?', ['Median', 'Average'], index=0)
-    y_type = 'median %' if trends_type == 'Median' else 'mean %'
 
     if bokeh:
-        s = bokeh_scatter_init(pay_norm, x_label=SALARY_COLUMN,
-                               y_label='Percentage', plot_constants=True)
-        s.y_range = Range1d(-10, 25)
-
-        # Unchanged set
-        s = bokeh_scatter(s_col[same_title], percent[same_title],
-                          name=result_df.loc[same_title, 'Name_A'],
-                          fc='white', label='Unchanged', s=s)
-
-        # Changed set
-        s = bokeh_scatter(s_col[title_changed], percent[title_changed],
-                          name=result_df.loc[title_changed, 'Name_A'],
-                          fc='white', ec='purple',
-                          label='Changed', s=s)
-
-        # Plot All averages on top
-        all_average_df, all_bin_edges = \
-            compute_bin_averages(s_col, percent, range(len(s_col)),
-                                 adaptive_bins, pay_norm=pay_norm)
-        s = bokeh_scatter(all_average_df['bin'],
-                          all_average_df[y_type],
-                          name=all_average_df['Salary range'],
-                          x_err=[all_bin_edges[:-1], all_bin_edges[1:]],
-                          fc='black', ec='black', size=10, alpha=0.6,
-                          label=f'All ({trends_type})', s=s)
-
-        # Plot Unchanged averages on top
-        same_title_average_df, same_title_bin_edges = \
-            compute_bin_averages(s_col, percent, same_title, adaptive_bins,
-                                 pay_norm=pay_norm)
-
-        s = bokeh_scatter(same_title_average_df['bin'],
-                          same_title_average_df[y_type],
-                          name=same_title_average_df['Salary range'],
-                          x_err=[same_title_bin_edges[:-1], same_title_bin_edges[1:]],
-                          ec='black', size=10, alpha=0.6,
-                          label=f'Unchanged ({trends_type})', s=s)
-
-        # Plot Changed averages on top
-        title_changed_average_df, title_change_bin_edges = \
-            compute_bin_averages(s_col, percent, title_changed, adaptive_bins,
-                                 pay_norm=pay_norm)
-
-        s = bokeh_scatter(title_changed_average_df['bin'],
-                          title_changed_average_df[y_type],
-                          name=title_changed_average_df['Salary range'],
-                          x_err=[title_change_bin_edges[:-1], title_change_bin_edges[1:]],
-                          size=10, fc='purple', ec='black', alpha=0.6,
-                          label=f'Changed ({trends_type})', s=s)
-
-        st.bokeh_chart(s, use_container_width=True)
+        # Employees in the selected salary range are shown, subsampled to
+        # LOD_MAX_POINTS. Averages below are for all employees
+        salary_range = sidebar.select_salary_range(pay_norm, s_col.max())
+        shown, n_in_range = scatter_subsample(s_col, salary_range,
+                                              LOD_MAX_POINTS)
+        if len(shown) < n_in_range:
+            st.info(f"Showing a random {len(shown):,} of {n_in_range:,} "
+                    f"employees. Narrow the salary range on the sidebar to "
+                    f"show all employees in the range")
+
+        # Statistics of All, Unchanged and Changed are computed together
+        (all_average_df, same_title_average_df, title_changed_average_df), \
+            bin_edges = compute_bin_averages(
+                s_col, percent, [range(len(s_col)), same_title, title_changed],
+                adaptive_bins, pay_norm=pay_norm)
+
+        render_key = None
+        if data_id:
+            render_key = (data_id, 'Wage Growth', fy_select, pay_norm,
+                          bin_size, tuple(salary_range), trends_type)
+        if not show_cached_chart(render_key):
+            s = wage_growth_figure(
+                s_col, percent, result_df['Name'],
+                result_df['Title Changed'].to_numpy(), shown,
+                [all_average_df, same_title_average_df,
+                 title_changed_average_df],
+                bin_edges, trends_type, pay_norm, salary_range)
+            show_chart(s, render_key)
 
         # Merged table, illustrate at the bottom
         st.markdown("""
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules of salary_app are imported without a package, as by streamlit
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'salary_app'))
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from etl import set_unique_identifier
+
+
+def write_year(path, fy, names):
+    df = pd.DataFrame({
+        'Name': names,
+        'Primary Title': 'Professor',
+        'Department': 'Physics',
+        'Annual Salary at Full FTE': 100000.0,
+    })
+    filename = path / f'{fy}_clean.csv'
+    df.to_csv(filename, index=False)
+    return filename
+
+
+def test_alias_uid_only_in_matched_years(tmp_path):
+    """An alias and its matched name in the same year are different people"""
+    list_files = [
+        write_year(tmp_path, 'FY2011-12', ['Smith,John A']),
+        write_year(tmp_path, 'FY2013-14', ['Smith,John']),
+        write_year(tmp_path, 'FY2014-15', ['Smith,John A', 'Smith,John']),
+    ]
+
+    unique_df, df_dict = set_unique_identifier(list_files, diagnostics=False,
+                                               fuzzy=True)
+
+    assert unique_df['Name'].tolist() == ['Smith,John A']
+    assert df_dict['FY2013-14']['uid'].tolist() == [1]
+
+    uid = df_dict['FY2014-15'].set_index('Name')['uid']
+    assert uid['Smith,John A'] == 1
+    assert pd.isnull(uid['Smith,John'])
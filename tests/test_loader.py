@@ -0,0 +1,98 @@
+import os
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import time
+from urllib.error import HTTPError
+
+import pandas as pd
+import pytest
+
+from etl import write_feather_cache, write_summary_tables
+from loader import feather_is_current, fetch_url, read_summary, read_table
+
+
+def test_stale_feather_falls_back_to_csv(tmp_path):
+    """unique.csv rewritten without write_feather_cache is read as CSV"""
+    unique_df = pd.DataFrame({'Name': ['Doe,Jane'], 'year': ['FY2019-20'],
+                              'uid': [1]})
+    unique_df.to_csv(tmp_path / 'unique.csv', index=False)
+    write_feather_cache(str(tmp_path))
+    assert feather_is_current(str(tmp_path), 'unique.feather')
+
+    unique_df.loc[1] = ['Doe,John', 'FY2019-20', 2]
+    unique_df.to_csv(tmp_path / 'unique.csv', index=False)
+
+    assert not feather_is_current(str(tmp_path), 'unique.feather')
+    df = read_table('unique', local=str(tmp_path))
+    assert df['Name'].tolist() == ['Doe,Jane', 'Doe,John']
+
+
+def test_stale_summary_is_not_used(tmp_path):
+    """FY*_clean.csv rewritten without write_summary_tables is not used"""
+    df = pd.DataFrame({
+        'Name': ['Doe,Jane', 'Doe,John'],
+        'Annual Salary at Full FTE': [50000.0, 70000.0],
+        'College Name': ['College 1', 'College 1'],
+        'Department': ['Dept 1', 'Dept 2'],
+        'College Location': ['Main Campus', None],
+    })
+    df.to_csv(tmp_path / 'FY2019-20_clean.csv', index=False)
+    write_summary_tables(str(tmp_path))
+    summary_df = read_summary('FY2019-20_summary', local=str(tmp_path))
+    assert summary_df.loc[('All', 'All'), 'max'] == 70000.0
+
+    df.loc[1, 'Annual Salary at Full FTE'] = 90000.0
+    df.to_csv(tmp_path / 'FY2019-20_clean.csv', index=False)
+
+    assert read_summary('FY2019-20_summary', local=str(tmp_path)) is None
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Local HTTP server of tmp_path / 'src', counting requests"""
+    src = tmp_path / 'src'
+    src.mkdir()
+    requests = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(src), **kwargs)
+
+        def send_response(self, code, message=None):
+            requests.append(code)
+            super().send_response(code, message)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}', src, requests
+    httpd.shutdown()
+
+
+def test_fetch_url_checks_source_after_max_age(server, tmp_path):
+    url, src, requests = server
+    cache_file = tmp_path / 'cache' / 'unique.csv'
+    (src / 'unique.csv').write_text('Name\nDoe,Jane\n')
+
+    fetch_url(f'{url}/unique.csv', cache_file)
+    fetch_url(f'{url}/unique.csv', cache_file)
+    assert requests == [200]
+
+    # Unchanged source is not downloaded again
+    fetch_url(f'{url}/unique.csv', cache_file, max_age=0)
+    assert requests == [200, 304]
+
+    (src / 'unique.csv').write_text('Name\nDoe,Jane\nDoe,John\n')
+    os.utime(src / 'unique.csv', (time() + 10, time() + 10))
+    fetch_url(f'{url}/unique.csv', cache_file, max_age=0)
+    assert requests == [200, 304, 200]
+    assert cache_file.read_text() == 'Name\nDoe,Jane\nDoe,John\n'
+
+
+def test_fetch_url_does_not_retry_client_errors(server, tmp_path):
+    url, src, requests = server
+    with pytest.raises(HTTPError):
+        fetch_url(f'{url}/missing.csv', tmp_path / 'missing.csv')
+    assert requests == [404]
@@ -0,0 +1,162 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from bokeh.embed import json_item
+
+from analysis import compute_bin_averages
+from constants import CURRENCY_NORM, LOD_MAX_POINTS
+import plots
+from plots import RENDER_CACHE, bin_data, bin_data_adaptive, \
+    bokeh_fig_init, merge_sparse_bins, scatter_subsample, \
+    show_cached_chart, show_chart, wage_growth_figure
+
+
+def merge_sparse_bins_loop(N_bin: np.ndarray, N_min: int) -> np.ndarray:
+    """Previous implementation of bin_data_adaptive merging, as reference"""
+    N_bin = N_bin.copy()
+    drops = []
+    bad = np.where(N_bin < N_min)[0]
+    for b in bad:
+        if b not in drops and b != len(N_bin)-1:
+            a = 0
+            while True:
+                drops.append(b + a + 1)
+                N_bin[b] += N_bin[b+a+1]
+                if N_bin[b] >= N_min or b+a+1 == len(N_bin)-1:
+                    break
+                else:
+                    a += 1
+
+    keep = np.ones(len(N_bin) + 1, dtype=bool)
+    keep[drops] = False
+    return keep
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_merge_sparse_bins_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(250):
+        n_bins = rng.integers(1, 300)
+        N_bin = rng.poisson(rng.uniform(0, 40), n_bins)
+        # Runs of empty bins, as at high salaries
+        N_bin[rng.random(n_bins) < rng.uniform(0, 0.8)] = 0
+        N_min = int(rng.integers(1, 60))
+
+        np.testing.assert_array_equal(merge_sparse_bins(N_bin, N_min),
+                                      merge_sparse_bins_loop(N_bin, N_min))
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('bin_size, pay_norm', [(1000, 1), (5000, 1),
+                                                (0.5, 2080), (2.5, 2088)])
+def test_bin_data_adaptive_matches_loop(seed, bin_size, pay_norm):
+    rng = np.random.default_rng(seed)
+    bins = bin_data(bin_size, pay_norm)
+    data = rng.lognormal(np.log(60000 / pay_norm), 0.6, 2000)
+    # As Wage Growth page, annual salaries are in $k
+    if CURRENCY_NORM and pay_norm == 1:
+        data /= 1e3
+    # Values on bin edges and missing values
+    data[:100] = rng.choice(bins, 100)
+    data[100:120] = np.nan
+    index_list = [rng.random(len(data)) < fraction
+                  for fraction in (1.0, 0.5, 0.05)]
+    N_min = int(rng.integers(1, 60))
+
+    # Most values are binned, so merging is not only of empty bins
+    in_bins = (data >= bins[0]) & (data <= bins[-1])
+    assert in_bins.sum() > 0.9 * len(data)
+
+    salary_bin_list = bin_data_adaptive(data, index_list, bin_size, pay_norm,
+                                        N_min=N_min)
+    for index, salary_bin in zip(index_list, salary_bin_list):
+        N_bin, _ = np.histogram(data[index], bins)
+        expected = bins[merge_sparse_bins_loop(N_bin, N_min)]
+        np.testing.assert_array_equal(salary_bin, expected)
+
+
+@pytest.mark.parametrize('n_records', [15000, 150000])
+def test_wage_growth_figure_size(n_records):
+    """Numeric columns are binary, and the size does not grow with the
+    number of employees"""
+    rng = np.random.default_rng(0)
+    salary = pd.Series(rng.lognormal(np.log(60000), 0.5, n_records) / 1e3)
+    percent = pd.Series(rng.normal(3, 5, n_records))
+    name = pd.Series([f'Last{i},First{i}' for i in range(n_records)])
+    is_changed = rng.random(n_records) < 0.1
+    same_title = np.flatnonzero(~is_changed)
+    title_changed = np.flatnonzero(is_changed)
+
+    bins = bin_data_adaptive(salary, title_changed, 10000, 1)
+    salary_range = [9.0, 501.0]
+    shown, _ = scatter_subsample(salary, salary_range, LOD_MAX_POINTS)
+    average_df_list, bin_edges = compute_bin_averages(
+        salary, percent, [range(n_records), same_title, title_changed], bins)
+
+    s = wage_growth_figure(salary, percent, name, is_changed, shown,
+                           average_df_list, bin_edges, 'Median', 1,
+                           salary_range)
+    item = json_item(s)
+
+    n_names = 0
+    for reference in item['doc']['roots']['references']:
+        if reference['type'] != 'ColumnDataSource':
+            continue
+        for column, values in reference['attributes']['data'].items():
+            if column in ['x', 'y', 'base', 'lower', 'upper']:
+                assert '__ndarray__' in values
+            if column == 'name' and 'x' in reference['attributes']['data']:
+                n_names += len(values)
+
+    # Names for hover are strings, only sent for shown employees
+    assert n_names <= LOD_MAX_POINTS + 3 * len(bin_edges)
+    assert len(json.dumps(item)) < 250 * 1024
+
+
+class PublicContainer:
+    """Streamlit container with only the public bokeh_chart"""
+
+    def __init__(self):
+        self.charts = []
+
+    def bokeh_chart(self, figure, use_container_width=False):
+        self.charts.append(figure)
+
+
+class Container(PublicContainer):
+    def __init__(self):
+        super().__init__()
+        self.protos = []
+
+    def _enqueue(self, delta_type, proto):
+        self.protos.append((delta_type, proto))
+
+
+def test_show_cached_chart():
+    key = ('test', 'show_cached_chart')
+    container = Container()
+    show_chart(bokeh_fig_init([0, 1]), key, container=container)
+    assert show_cached_chart(key, container=container)
+
+    assert [delta_type for delta_type, _ in container.protos] == \
+        ['bokeh_chart'] * 2
+    assert container.protos[0][1].figure == container.protos[1][1].figure
+    assert not show_cached_chart(('test', 'not cached'), container=container)
+
+
+def test_show_chart_falls_back_to_public_api(monkeypatch):
+    key = ('test', 'public')
+    container = PublicContainer()
+    s = bokeh_fig_init([0, 1])
+    assert not show_cached_chart(key, container=container)
+    show_chart(s, key, container=container)
+    assert container.charts == [s]
+    assert RENDER_CACHE.get(key) is None
+
+    # Streamlit without the BokehChart proto
+    monkeypatch.setattr(plots, 'BokehChartProto', None)
+    container = Container()
+    show_chart(s, key, container=container)
+    assert container.charts == [s] and not container.protos
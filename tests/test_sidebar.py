@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+
+from sidebar import select_salary_range
+
+
+@pytest.mark.parametrize('salary', [pd.Series([], dtype=float),
+                                    pd.Series([np.nan, np.nan])])
+def test_select_salary_range_without_salaries(salary, monkeypatch):
+    sliders = []
+
+    def slider(label, min_value, max_value, value):
+        sliders.append((min_value, max_value, value))
+        return value
+
+    monkeypatch.setattr(st.sidebar, 'slider', slider)
+    salary_range = select_salary_range(1, salary.max())
+
+    min_value, max_value, value = sliders[0]
+    assert np.isfinite(max_value) and max_value >= value[1]
+    assert list(value) == salary_range